@@ -0,0 +1,221 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from well_detect import detect_rows_and_wells, EXPECTED_COLS
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# ==== CONSTANTS ====
+DEVICE_DB_PATH = os.environ.get("DEVICE_DB_PATH", os.path.join(script_dir, "devices.db"))
+PROFILE_MIN_SAMPLES = 3     # Successful analyses before a device profile is used
+RADIUS_MARGIN = 0.25        # Narrowed Hough radius range: expected radius +/- 25%
+EMA_ALPHA = 0.3             # Weight of the newest analysis in radius/spacing averages
+MAX_PROFILES = 10000        # Least recently updated profiles are evicted beyond this
+
+COUNTERS = ("requests", "profile_hits", "profile_misses", "hough_skipped",
+            "hough_narrowed", "hough_default", "profile_resets")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS device_profiles (
+    device_id TEXT PRIMARY KEY,
+    samples INTEGER NOT NULL,
+    hough_runs INTEGER NOT NULL,
+    hough_useful INTEGER NOT NULL,
+    radius REAL NOT NULL,
+    spacing REAL,
+    min_wells INTEGER NOT NULL,
+    min_contour_blobs INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_device_profiles_updated ON device_profiles(updated_at);
+CREATE TABLE IF NOT EXISTS detection_counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+PROFILE_COLUMNS = ("samples", "hough_runs", "hough_useful", "radius", "spacing", "min_wells", "min_contour_blobs")
+
+class DeviceProfiles:
+    """
+    Per-device detection profiles learned from successful analyses.
+
+    Phones whose photos always trigger the Hough fallback pay for a full
+    GaussianBlur + HoughCircles on every upload. Once a device has
+    PROFILE_MIN_SAMPLES analyses, its profile either skips the fallback
+    (when Hough ran for it but never added a well, i.e. contours suffice, as
+    with strips of fewer than EXPECTED_COLS wells) or narrows Hough to the
+    device's usual well radius and spacing. Devices whose photos never
+    needed the fallback keep default settings; there is nothing to save.
+
+    Profiles and counters are stored in SQLite (WAL mode), so all server
+    processes (e.g. gunicorn workers) learn from and report the same uploads.
+    """
+
+    def __init__(self, min_samples=PROFILE_MIN_SAMPLES, path=DEVICE_DB_PATH):
+        self.min_samples = min_samples
+        self.path = path
+        self.local = threading.local()
+
+    # ==== DATABASE ====
+
+    def _conn(self):
+        # One connection per thread, reopened after a fork (gunicorn preload)
+        conn = getattr(self.local, "conn", None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self.local.conn, self.local.pid = conn, os.getpid()
+        return conn
+
+    def _write(self, fn):
+        """Run fn(conn) in an IMMEDIATE transaction: one writer across all processes"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            out = fn(conn)
+            conn.execute("COMMIT")
+            return out
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _count(self, conn, *names):
+        for name in names:
+            conn.execute("INSERT INTO detection_counters VALUES (?, 1) "
+                         "ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,))
+
+    def _profile(self, device_id):
+        row = self._conn().execute(f"SELECT {', '.join(PROFILE_COLUMNS)} FROM device_profiles "
+                                   "WHERE device_id = ?", (device_id,)).fetchone()
+        return dict(zip(PROFILE_COLUMNS, row)) if row else None
+
+    # ==== API ====
+
+    def plan(self, device_id):
+        """
+        Detection settings for a device: {"mode", "allow_fallback", "hough_params",
+        "min_wells", "min_contour_blobs"}. A detection with fewer clustered wells
+        or contour blobs than the minimums is treated as having come up short.
+        """
+        profile = self._profile(device_id) if device_id else None
+        if profile is None or profile["samples"] < self.min_samples or profile["hough_runs"] == 0:
+            return {"mode": "default", "allow_fallback": True, "hough_params": None,
+                    "min_wells": 0, "min_contour_blobs": 0}
+
+        if profile["hough_useful"] == 0:
+            # Contours alone found every well each time (or Hough only duplicated them);
+            # fewer contour blobs than ever seen means this photo is different. Compared
+            # with the raw contour count: clustering may drop stray blobs of any photo
+            return {"mode": "skip", "allow_fallback": False, "hough_params": None,
+                    "min_wells": 0, "min_contour_blobs": profile["min_contour_blobs"]}
+
+        r = profile["radius"]
+        params = {
+            "minR": max(1, int(r * (1 - RADIUS_MARGIN))),
+            "maxR": int(math.ceil(r * (1 + RADIUS_MARGIN)))
+        }
+        if profile["spacing"]:
+            params["minDist"] = max(8, int(profile["spacing"] * 0.8))
+        return {"mode": "narrowed", "allow_fallback": True, "hough_params": params,
+                "min_wells": min(EXPECTED_COLS, profile["min_wells"]), "min_contour_blobs": 0}
+
+    def detect(self, img, device_id, observe=True):
+        """
+        detect_rows_and_wells using the device's profile. If the profiled
+        detection comes up short, the image is re-run with default settings
+        and the profile is dropped, so a stale profile never costs wells.
+        Returns (rows, info). With observe=False the caller folds the result
+        into the profile later (self.observe), e.g. only once it is kept.
+        """
+        plan = self.plan(device_id)
+        info = {}
+        rows = detect_rows_and_wells(img, plan["allow_fallback"], plan["hough_params"], info)
+
+        counters = ["requests"]
+        reset = (info["contour_blobs"] < plan["min_contour_blobs"]
+                 or sum(len(r) for r in rows) < plan["min_wells"])
+        if reset:
+            info = {}
+            rows = detect_rows_and_wells(img, info=info)
+            counters.append("profile_resets")
+            plan = {"mode": "default"}
+
+        info["profile"] = plan["mode"]
+        # A hit is a request where the profile changed what ran
+        if plan["mode"] == "skip" and info["fallback_needed"]:
+            counters += ["hough_skipped", "profile_hits"]
+        elif plan["mode"] == "narrowed" and info["hough_ran"]:
+            counters += ["hough_narrowed", "profile_hits"]
+        else:
+            counters.append("profile_misses")
+            if info["hough_ran"]:
+                counters.append("hough_default")
+
+        def count(conn):
+            if reset:
+                conn.execute("DELETE FROM device_profiles WHERE device_id = ?", (device_id,))
+            self._count(conn, *counters)
+        self._write(count)
+
+        if observe:
+            self.observe(device_id, rows, info)
+        return rows, info
+
+    def observe(self, device_id, rows, info):
+        """Fold one analysis into the device's profile"""
+        wells = [w for row in rows for w in row]
+        if not device_id or not wells:
+            return
+
+        radius = float(np.median([w[2] for w in wells]))
+        gaps = [b[0] - a[0] for row in rows for a, b in zip(row, row[1:])]
+        spacing = float(np.median(gaps)) if gaps else None
+
+        def update(conn):
+            # Read and write in one IMMEDIATE transaction, so concurrent uploads
+            # from other processes are folded in one after the other
+            profile = self._profile(device_id)
+            if profile is None:
+                profile = {"samples": 0, "hough_runs": 0, "hough_useful": 0,
+                           "radius": radius, "spacing": spacing,
+                           "min_wells": len(wells), "min_contour_blobs": info["contour_blobs"]}
+            profile["samples"] += 1
+            profile["min_wells"] = min(profile["min_wells"], len(wells))
+            profile["min_contour_blobs"] = min(profile["min_contour_blobs"], info["contour_blobs"])
+            if info["hough_ran"]:
+                profile["hough_runs"] += 1
+                if info["hough_added"] > 0:
+                    profile["hough_useful"] += 1
+            profile["radius"] += EMA_ALPHA * (radius - profile["radius"])
+            if spacing is not None:
+                prev = profile["spacing"]
+                profile["spacing"] = spacing if prev is None else prev + EMA_ALPHA * (spacing - prev)
+
+            conn.execute(f"INSERT OR REPLACE INTO device_profiles (device_id, {', '.join(PROFILE_COLUMNS)}, "
+                         f"updated_at) VALUES (?, {', '.join('?' * len(PROFILE_COLUMNS))}, ?)",
+                         (device_id, *(profile[c] for c in PROFILE_COLUMNS), time.time()))
+            conn.execute("DELETE FROM device_profiles WHERE device_id IN (SELECT device_id FROM device_profiles "
+                         "ORDER BY updated_at DESC LIMIT -1 OFFSET ?)", (MAX_PROFILES,))
+        self._write(update)
+
+    def snapshot(self):
+        """
+        Counters and hit rate (share of requests where a profile skipped or
+        narrowed Hough), across all server processes
+        """
+        conn = self._conn()
+        m = {name: 0 for name in COUNTERS}
+        m.update(dict(conn.execute("SELECT name, value FROM detection_counters")))
+        profiled = m["profile_hits"] + m["profile_misses"]
+        m["hit_rate"] = m["profile_hits"] / profiled if profiled else 0.0
+        m["profiles"] = conn.execute("SELECT COUNT(*) FROM device_profiles").fetchone()[0]
+        m["profiles_active"] = conn.execute("SELECT COUNT(*) FROM device_profiles WHERE samples >= ?",
+                                            (self.min_samples,)).fetchone()[0]
+        return m
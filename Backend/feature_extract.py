@@ -35,3 +35,63 @@ def extract_R_values(img, rows):
         })
 
     return results
+
+def inner_well_pixels(img, x, y, r, scale=INNER_SCALE):
+    """
+    Return the BGR pixels inside a well's inner circle.
+    Only the circle's bounding window is read, so this also works on
+    memory-mapped images without touching the rest of the sheet.
+    """
+    inner_r = max(1, int(r * scale))
+    h, w = img.shape[:2]
+    x0, y0 = max(0, x - inner_r), max(0, y - inner_r)
+    x1, y1 = min(w, x + inner_r + 1), min(h, y + inner_r + 1)
+    if x0 >= x1 or y0 >= y1:
+        return np.empty((0, 3), dtype=np.uint8)
+
+    window = np.ascontiguousarray(img[y0:y1, x0:x1])
+    mask = np.zeros(window.shape[:2], dtype=np.uint8)
+    cv2.circle(mask, (x - x0, y - y0), inner_r, 255, -1)
+    return window[mask == 255]
+
+def sample_wells(img, rows):
+    """
+    Sample every well by reading only its own window of the image.
+
+    Returns (features, color_values) in the formats produced by
+    extract_R_values and main.extract_color_values_from_image.
+    """
+    features = []
+    color_values = []
+    well_counter = 0
+
+    for trial_idx, row in enumerate(rows):
+        r_values = []
+        for x, y, r in row:
+            well_counter += 1
+            region = inner_well_pixels(img, x, y, r)
+            if len(region) > 0:
+                b_mean, g_mean, r_mean = (float(v) for v in region.mean(axis=0))
+                hsv = cv2.cvtColor(region.reshape(-1, 1, 3), cv2.COLOR_BGR2HSV)
+                s_mean = float(np.mean(hsv[:, 0, 1]))
+            else:
+                b_mean = g_mean = r_mean = s_mean = 0.0
+
+            r_values.append(r_mean)
+            color_values.append({
+                "well": well_counter,
+                "trial": trial_idx + 1,
+                "r": r_mean,
+                "g": g_mean,
+                "b": b_mean,
+                "rgb_mean": (r_mean + g_mean + b_mean) / 3,
+                "s_mean": s_mean,
+                "concentration": 0.0
+            })
+
+        features.append({
+            "trial": trial_idx + 1,
+            "R_values": r_values
+        })
+
+    return features, color_values
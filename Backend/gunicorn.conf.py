@@ -0,0 +1,26 @@
+"""
+Gunicorn settings for a preforked, pre-warmed backend:
+
+    gunicorn main:app -c gunicorn.conf.py
+
+The app is imported and warmed up once in the master (models loaded, one
+inference on reference.jpg), then forked. Workers start already warm and
+share the model and library pages copy-on-write.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8001")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn_worker.UvicornWorker"   # pip install uvicorn-worker
+preload_app = True
+timeout = 120
+
+def when_ready(server):
+    # Runs in the master after the preloaded app is imported, before any fork
+    import main
+    main.warm_up()
+    # Keep the warmed objects out of future GC passes so collections in the
+    # workers don't write to (and un-share) their pages
+    gc.freeze()
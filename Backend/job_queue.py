@@ -0,0 +1,354 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# ==== CONSTANTS ====
+JOB_DB_PATH = os.environ.get("JOB_DB_PATH", os.path.join(script_dir, "jobs.db"))
+PRIORITIES = {"interactive": 0, "bulk": 10}     # Lower runs first
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))  # Worker threads per server process
+POLL_INTERVAL = 0.5         # Seconds idle workers wait before checking for jobs queued by other processes
+MAX_ATTEMPTS = 3            # Runs a job gets before a worker dying on it marks it failed
+MAX_FINISHED_JOBS = 1000    # Finished jobs kept for polling before the oldest are forgotten
+WAIT_SAMPLES = 500          # Recent queue waits used for the wait-time metrics
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT UNIQUE NOT NULL,
+    key TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    params TEXT,
+    payload BLOB,
+    result TEXT,
+    error TEXT,
+    worker TEXT,                -- "<pid>:<process token>" of the process running it
+    attempts INTEGER NOT NULL DEFAULT 0,
+    submitted_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs(status, priority, seq);
+CREATE INDEX IF NOT EXISTS idx_jobs_key ON jobs(key, status);
+CREATE TABLE IF NOT EXISTS job_counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+COLUMNS = "id, priority, status, cancel_requested, params, result, error, submitted_at, started_at, finished_at"
+
+def _priority_name(priority):
+    return next(k for k, v in PRIORITIES.items() if v == priority)
+
+class Job:
+    """Snapshot of one job row. The image bytes stay in the database until the job has run."""
+
+    def __init__(self, row):
+        (self.id, self.priority, self.status, cancel_requested, params,
+         result, self.error, self.submitted_at, self.started_at, self.finished_at) = row
+        self.cancel_requested = bool(cancel_requested)
+        self.params = json.loads(params) if params else {}
+        self.result = json.loads(result) if result else None
+
+    def to_dict(self, include_result=True):
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "priority": _priority_name(self.priority),
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+        if self.error is not None:
+            data["error"] = self.error
+        if self.cancel_requested and self.status == RUNNING:
+            data["cancel_requested"] = True
+        if include_result and self.status == DONE:
+            data["result"] = self.result
+        return data
+
+class JobQueue:
+    """
+    Priority job queue stored in SQLite (WAL mode), with worker threads.
+
+    Queue and job table live in the database, so every server process
+    (e.g. gunicorn workers) sees the same jobs: any process can answer
+    status, cancel and metrics requests, and the worker threads of all
+    processes take jobs from the one queue. Interactive jobs run before bulk
+    ones; FIFO within a priority. Submitting an image identical to one still
+    queued or running (same bytes and parameters) returns the existing job.
+
+    `handler(payload, **params)` does the work. `commit(output, **params)`
+    turns its output into the stored result and may have side effects
+    (recording the analysis); it only runs for jobs that were not cancelled.
+    """
+
+    def __init__(self, handler, commit=None, workers=JOB_WORKERS, path=JOB_DB_PATH):
+        self.handler = handler
+        self.commit = commit or (lambda output, **params: output)
+        self.workers = workers
+        self.path = path
+        self.local = threading.local()
+        self.cond = threading.Condition()
+        self.threads = []
+        self.pid = None
+        self.token = None           # identifies this process in the worker column, even if a pid is reused
+
+    # ==== DATABASE ====
+
+    def _conn(self):
+        # One connection per thread, reopened after a fork (gunicorn preload)
+        conn = getattr(self.local, "conn", None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            if "attempts" not in [c[1] for c in conn.execute("PRAGMA table_info(jobs)")]:
+                # jobs.db created before the attempt limit
+                conn.execute("ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+            self.local.conn, self.local.pid = conn, os.getpid()
+        return conn
+
+    def _write(self, fn):
+        """Run fn(conn) in an IMMEDIATE transaction: one writer across all processes"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            out = fn(conn)
+            conn.execute("COMMIT")
+            return out
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _count(self, conn, name):
+        conn.execute("INSERT INTO job_counters VALUES (?, 1) "
+                     "ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,))
+
+    def _row(self, conn, job_id):
+        row = conn.execute(f"SELECT {COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job(row) if row else None
+
+    # ==== WORKERS ====
+
+    def start(self):
+        """Start this process's worker threads (idempotent; also called on first submit)"""
+        with self.cond:
+            if self.pid != os.getpid():
+                # New process: threads of the parent did not survive the fork
+                self.pid, self.threads = os.getpid(), []
+                self.token = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+                self._requeue_orphans()
+            self.threads = [t for t in self.threads if t.is_alive()]
+            for i in range(len(self.threads), self.workers):
+                t = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                t.start()
+                self.threads.append(t)
+
+    def _requeue_orphans(self):
+        """
+        Put back jobs left running by a server process that has exited. A job
+        that has already been tried MAX_ATTEMPTS times is marked failed
+        instead, so an upload that kills its worker (e.g. out of memory on a
+        decompression bomb) does not take down every worker that starts.
+        """
+        def requeue(conn):
+            orphans = []
+            for job_id, worker, attempts in conn.execute("SELECT id, worker, attempts FROM jobs WHERE status = ?",
+                                                         (RUNNING,)):
+                pid = int(worker.split(":")[0])
+                if pid == os.getpid():
+                    orphans.append((job_id, attempts))  # an earlier process that had our pid
+                    continue
+                try:
+                    os.kill(pid, 0)
+                except ProcessLookupError:
+                    orphans.append((job_id, attempts))
+                except OSError:
+                    pass    # exists, owned by someone else
+            requeued, failed = 0, 0
+            for job_id, attempts in orphans:
+                if attempts >= MAX_ATTEMPTS:
+                    conn.execute("UPDATE jobs SET status = ?, error = ?, finished_at = ?, payload = NULL WHERE id = ?",
+                                 (FAILED, f"Worker exited while running the job ({attempts} attempts)",
+                                  time.time(), job_id))
+                    self._count(conn, FAILED)
+                    failed += 1
+                else:
+                    conn.execute("UPDATE jobs SET status = ?, started_at = NULL, worker = NULL WHERE id = ?",
+                                 (QUEUED, job_id))
+                    requeued += 1
+            return requeued, failed
+        requeued, failed = self._write(requeue)
+        if requeued:
+            print(f"[JOBS] Requeued {requeued} jobs of exited workers", flush=True)
+        if failed:
+            print(f"[JOBS] WARNING: failed {failed} jobs that exited their worker {MAX_ATTEMPTS} times", flush=True)
+
+    def _claim(self):
+        # Idle polling is a plain read; the write lock is only taken when there is work
+        if self._conn().execute("SELECT 1 FROM jobs WHERE status = ? LIMIT 1", (QUEUED,)).fetchone() is None:
+            return None
+
+        def claim(conn):
+            row = conn.execute("SELECT id, params, payload FROM jobs WHERE status = ? "
+                               "ORDER BY priority, seq LIMIT 1", (QUEUED,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE jobs SET status = ?, started_at = ?, worker = ?, attempts = attempts + 1 "
+                         "WHERE id = ?", (RUNNING, time.time(), self.token, row[0]))
+            return row
+        return self._write(claim)
+
+    def _work(self):
+        while True:
+            claimed = self._claim()
+            if claimed is None:
+                with self.cond:
+                    self.cond.wait(POLL_INTERVAL)
+                continue
+
+            job_id, params, payload = claimed
+            params = json.loads(params)
+            try:
+                output = self.handler(payload, **params)
+                status, error = DONE, None
+            except Exception as e:
+                print(f"[JOBS] ERROR: job {job_id} failed: {e}", flush=True)
+                traceback.print_exc()
+                output, status, error = None, FAILED, str(e)
+            self._finish(job_id, params, status, output, error)
+
+    def _finish(self, job_id, params, status, output, error):
+        def finish(conn):
+            # Checked in the same write transaction as the status change, so a
+            # cancel either lands before (result discarded) or sees the job done
+            cancelled = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+            final_status, result, final_error = status, None, error
+            if cancelled:
+                final_status, final_error = CANCELLED, None
+            elif status == DONE:
+                try:
+                    result = json.dumps(self.commit(output, **params))
+                except Exception as e:
+                    print(f"[JOBS] ERROR: job {job_id} could not be committed: {e}", flush=True)
+                    traceback.print_exc()
+                    final_status, final_error = FAILED, str(e)
+            conn.execute("UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, payload = NULL "
+                         "WHERE id = ?", (final_status, result, final_error, time.time(), job_id))
+            self._count(conn, final_status)
+            conn.execute("DELETE FROM jobs WHERE seq IN (SELECT seq FROM jobs WHERE status IN (?, ?, ?) "
+                         "ORDER BY seq DESC LIMIT -1 OFFSET ?)", (*FINISHED, MAX_FINISHED_JOBS))
+        self._write(finish)
+
+    # ==== API ====
+
+    def submit(self, payload, priority="interactive", **params):
+        """
+        Queue a job; returns (job, deduplicated). A duplicate of a queued job
+        is raised to the higher of the two priorities.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}', expected one of {sorted(PRIORITIES)}")
+        digest = hashlib.sha256(payload)
+        digest.update(repr(sorted(params.items())).encode())
+        key = digest.hexdigest()
+        level = PRIORITIES[priority]
+
+        def submit(conn):
+            existing = conn.execute("SELECT id, priority, status FROM jobs WHERE key = ? AND status IN (?, ?)",
+                                    (key, QUEUED, RUNNING)).fetchone()
+            if existing is not None:
+                job_id, current, status = existing
+                if status == QUEUED and level < current:
+                    conn.execute("UPDATE jobs SET priority = ? WHERE id = ?", (level, job_id))
+                self._count(conn, "deduplicated")
+                return self._row(conn, job_id), True
+
+            job_id = uuid.uuid4().hex
+            conn.execute("INSERT INTO jobs (id, key, priority, status, params, payload, submitted_at) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (job_id, key, level, QUEUED, json.dumps(params), payload, time.time()))
+            self._count(conn, "submitted")
+            return self._row(conn, job_id), False
+
+        job, deduplicated = self._write(submit)
+        self.start()
+        with self.cond:
+            self.cond.notify()
+        return job, deduplicated
+
+    def get(self, job_id):
+        return self._row(self._conn(), job_id)
+
+    def cancel(self, job_id):
+        """
+        Cancel a job. Queued jobs are dropped at once. Running jobs run to
+        completion, but their result is discarded and never recorded.
+        Returns the job, or None if unknown.
+        """
+        def cancel(conn):
+            job = self._row(conn, job_id)
+            if job is None or job.status in FINISHED:
+                return job
+            if job.status == QUEUED:
+                conn.execute("UPDATE jobs SET status = ?, finished_at = ?, payload = NULL WHERE id = ?",
+                             (CANCELLED, time.time(), job_id))
+                self._count(conn, CANCELLED)
+            else:
+                conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+            return self._row(conn, job_id)
+        return self._write(cancel)
+
+    def position(self, job):
+        """Number of queued jobs that will run before this one"""
+        conn = self._conn()
+        row = conn.execute("SELECT priority, seq, status FROM jobs WHERE id = ?", (job.id,)).fetchone()
+        if row is None or row[2] != QUEUED:
+            return 0
+        priority, seq, _ = row
+        return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ? AND (priority < ? OR (priority = ? AND seq < ?))",
+                            (QUEUED, priority, priority, seq)).fetchone()[0]
+
+    def metrics(self):
+        """Queue depth per priority, running jobs, wait times and counters (across all processes)"""
+        conn = self._conn()
+        depth = {name: 0 for name in PRIORITIES}
+        for priority, n in conn.execute("SELECT priority, COUNT(*) FROM jobs WHERE status = ? GROUP BY priority",
+                                        (QUEUED,)):
+            depth[_priority_name(priority)] = n
+        running = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (RUNNING,)).fetchone()[0]
+        oldest = conn.execute("SELECT MIN(submitted_at) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+        waits = np.array([r[0] for r in conn.execute(
+            "SELECT started_at - submitted_at FROM jobs WHERE started_at IS NOT NULL "
+            "ORDER BY started_at DESC LIMIT ?", (WAIT_SAMPLES,))])
+        counters = {"submitted": 0, "deduplicated": 0, DONE: 0, FAILED: 0, CANCELLED: 0}
+        counters.update(dict(conn.execute("SELECT name, value FROM job_counters")))
+        return {
+            "queue_depth": depth,
+            "running": running,
+            "workers_per_process": self.workers,
+            "oldest_queued_s": None if oldest is None else time.time() - oldest,
+            "wait_s": None if not len(waits) else {
+                "mean": float(waits.mean()),
+                "p50": float(np.percentile(waits, 50)),
+                "p95": float(np.percentile(waits, 95)),
+                "max": float(waits.max()),
+                "samples": int(len(waits))
+            },
+            **counters
+        }
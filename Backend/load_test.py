@@ -0,0 +1,374 @@
+"""
+Load test for the FastAPI backends: start a local uvicorn server, replay
+plate images against /analyze at a given concurrency and arrival rate, and
+report throughput, latency percentiles, error rate and server memory.
+Exits with status 1 if any --slo-* threshold is violated.
+
+    python load_test.py --concurrency 8 --duration 30
+    python load_test.py --app app --rate 4 --duration 60 --slo-p99-ms 2000
+    python load_test.py --images ../captures --requests 200 --json report.json
+    python load_test.py --url http://10.1.28.38:8001 --concurrency 4   # existing server
+
+--rate 0 (the default) is closed-loop: each of the --concurrency clients
+sends its next request as soon as the previous one returns. A positive
+--rate sends requests with Poisson arrivals at that many per second, and
+latency is measured from the scheduled arrival, so time spent waiting for
+a free client counts (no coordinated omission).
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from benchmark_blobs import synthetic_plate
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# ==== CONSTANTS ====
+APPS = {
+    "backend": script_dir,                                                   # Backend/main.py
+    "app": os.path.join(script_dir, "..", "ColorAnalyzerApp", "backend")     # ColorAnalyzerApp/backend/main.py
+}
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+STARTUP_TIMEOUT = 120       # Seconds to wait for /health after starting the server
+REQUEST_TIMEOUT = 120       # Per-request timeout (matches the app's API timeout)
+RSS_INTERVAL = 0.5          # Seconds between server memory samples
+
+def load_images(directory, synthetic, size):
+    """Encoded images to replay: every image file in `directory`, else synthetic plates"""
+    if directory:
+        images = []
+        for name in sorted(os.listdir(directory)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                with open(os.path.join(directory, name), "rb") as f:
+                    images.append((name, f.read()))
+        if not images:
+            sys.exit(f"No images found in {directory}")
+        return images
+
+    width, height = size
+    images = []
+    for seed in range(synthetic):
+        img = synthetic_plate(width, height, specks=width * height // 2000, seed=seed)
+        ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        images.append((f"synthetic_{seed}.jpg", buf.tobytes()))
+    return images
+
+def multipart_body(filename, data):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+def send(url, filename, data):
+    """POST one image; returns (ok, error message or None)"""
+    body, content_type = multipart_body(filename, data)
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": content_type}, method="POST")
+    try:
+        with urllib.request.urlopen(req, timeout=REQUEST_TIMEOUT) as resp:
+            payload = resp.read()
+    except urllib.error.HTTPError as e:
+        return False, f"HTTP {e.code}"
+    except Exception as e:
+        return False, type(e).__name__
+    try:
+        result = json.loads(payload)
+    except ValueError:
+        return False, "invalid JSON"
+    # The backends report processing failures as {"error": ...} with status 200
+    if isinstance(result, dict) and "error" in result:
+        return False, "error response"
+    return True, None
+
+# ==== SERVER ====
+def start_server(app, port, tmp_dir, profile_sample_rate=0.0):
+    """
+    Start uvicorn for one of the backends. Its result store, job queue,
+    device profiles and traces go to `tmp_dir`, so the test neither takes
+    jobs queued on the real server nor writes into its databases.
+    """
+    env = dict(os.environ)
+    env.setdefault("RESULT_DB_PATH", os.path.join(tmp_dir, "results.db"))
+    env.setdefault("JOB_DB_PATH", os.path.join(tmp_dir, "jobs.db"))
+    env.setdefault("DEVICE_DB_PATH", os.path.join(tmp_dir, "devices.db"))
+    env.setdefault("PROFILE_DIR", os.path.join(tmp_dir, "profiles"))
+    env["PROFILE_SAMPLE_RATE"] = str(profile_sample_rate)  # sampled profiling would skew the numbers
+    log_path = os.path.join(tmp_dir, "server.log")
+    log = open(log_path, "w")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=os.path.abspath(APPS[app]), env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    return proc, log, log_path
+
+def wait_healthy(base_url, proc=None):
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline:
+        if proc is not None and proc.poll() is not None:
+            sys.exit(f"Server exited during startup (status {proc.returncode})")
+        try:
+            with urllib.request.urlopen(base_url + "/health", timeout=5) as resp:
+                if resp.status == 200:
+                    return
+        except Exception:
+            pass
+        time.sleep(0.5)
+    sys.exit(f"Server not healthy after {STARTUP_TIMEOUT}s")
+
+def read_rss(pid):
+    """Resident memory of a process in bytes (psutil if installed, else /proc), or None"""
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except ImportError:
+        pass
+    except Exception:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+class RssSampler(threading.Thread):
+    def __init__(self, pid):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.samples = []
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            rss = read_rss(self.pid)
+            if rss is not None:
+                self.samples.append(rss)
+            self.stop_event.wait(RSS_INTERVAL)
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+# ==== LOAD ====
+def run_load(url, images, concurrency, rate, duration, max_requests, seed=0):
+    """
+    Send requests until `duration` seconds or `max_requests` have passed.
+    Returns (records, elapsed); each record is (latency_s, ok, error).
+
+    Images are drawn from one seeded generator by a single thread at a time
+    (the arrival loop, or a client holding the lock), so the same --seed
+    replays the images in the same order.
+    """
+    rng = random.Random(seed)
+    records = []
+    lock = threading.Lock()
+    counter = iter(range(max_requests or sys.maxsize))
+    start = time.perf_counter()
+    deadline = start + duration if duration else None
+
+    def one(scheduled, image):
+        ok, error = send(url, *image)
+        with lock:
+            records.append((time.perf_counter() - scheduled, ok, error))
+
+    if rate > 0:
+        # Open loop: Poisson arrivals, independent of how fast the server answers
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            next_arrival = start
+            for _ in counter:
+                next_arrival += rng.expovariate(rate)
+                if deadline and next_arrival > deadline:
+                    break
+                image = images[rng.randrange(len(images))]
+                time.sleep(max(0.0, next_arrival - time.perf_counter()))
+                pool.submit(one, next_arrival, image)
+    else:
+        # Closed loop: each client sends its next request when the last one returns
+        def client():
+            while deadline is None or time.perf_counter() < deadline:
+                with lock:
+                    if next(counter, None) is None:
+                        return
+                    image = images[rng.randrange(len(images))]
+                one(time.perf_counter(), image)
+
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    return records, time.perf_counter() - start
+
+def summarize(records, elapsed, rss_samples):
+    """Latency percentiles are over successful requests only (None if there were none)"""
+    latencies = np.array([r[0] for r in records if r[1]]) * 1000
+    errors = [r[2] for r in records if not r[1]]
+    by_error = {}
+    for e in errors:
+        by_error[e] = by_error.get(e, 0) + 1
+    return {
+        "requests": len(records),
+        "errors": len(errors),
+        "error_rate": len(errors) / len(records) if records else 0.0,
+        "errors_by_type": by_error,
+        "elapsed_s": elapsed,
+        "throughput_rps": (len(records) - len(errors)) / elapsed if elapsed else 0.0,
+        "latency_ms": None if not len(latencies) else {
+            "mean": float(latencies.mean()),
+            "p50": float(np.percentile(latencies, 50)),
+            "p90": float(np.percentile(latencies, 90)),
+            "p99": float(np.percentile(latencies, 99)),
+            "max": float(latencies.max())
+        },
+        "server_rss_mb": None if not rss_samples else {
+            "start": rss_samples[0] / 2**20,
+            "peak": max(rss_samples) / 2**20,
+            "end": rss_samples[-1] / 2**20
+        }
+    }
+
+def check_slos(report, args):
+    """List of violated SLOs as readable strings"""
+    latency = report["latency_ms"]
+    if latency is None:
+        # Nothing succeeded: there is no latency to check, which must not read as a pass
+        return [f"no successful requests ({report['requests']} sent)"]
+    violations = []
+    if args.slo_p99_ms is not None and latency["p99"] > args.slo_p99_ms:
+        violations.append(f"p99 {latency['p99']:.0f} ms > {args.slo_p99_ms:.0f} ms")
+    if args.slo_p50_ms is not None and latency["p50"] > args.slo_p50_ms:
+        violations.append(f"p50 {latency['p50']:.0f} ms > {args.slo_p50_ms:.0f} ms")
+    if args.slo_error_rate is not None and report["error_rate"] > args.slo_error_rate:
+        violations.append(f"error rate {report['error_rate']:.2%} > {args.slo_error_rate:.2%}")
+    if args.slo_min_rps is not None and report["throughput_rps"] < args.slo_min_rps:
+        violations.append(f"throughput {report['throughput_rps']:.2f} rps < {args.slo_min_rps:.2f} rps")
+    rss = report["server_rss_mb"]
+    if args.slo_max_rss_mb is not None and rss and rss["peak"] > args.slo_max_rss_mb:
+        violations.append(f"peak RSS {rss['peak']:.0f} MB > {args.slo_max_rss_mb:.0f} MB")
+    return violations
+
+def print_report(report, violations, args):
+    latency = report["latency_ms"]
+    mode = f"Poisson {args.rate}/s" if args.rate > 0 else "closed loop"
+    print("=" * 70)
+    print(f"Load test: {args.url or args.app} {args.endpoint}, concurrency {args.concurrency}, {mode}")
+    print("=" * 70)
+    print(f"Requests:    {report['requests']} in {report['elapsed_s']:.1f}s "
+          f"({report['errors']} errors, {report['error_rate']:.2%})")
+    if report["errors_by_type"]:
+        print(f"Errors:      {report['errors_by_type']}")
+    print(f"Throughput:  {report['throughput_rps']:.2f} successful requests/s")
+    if latency is None:
+        print("Latency ms:  no successful requests")
+    else:
+        print(f"Latency ms:  mean {latency['mean']:.0f}  p50 {latency['p50']:.0f}  p90 {latency['p90']:.0f}  "
+              f"p99 {latency['p99']:.0f}  max {latency['max']:.0f}")
+    rss = report["server_rss_mb"]
+    if rss:
+        print(f"Server RSS:  start {rss['start']:.0f} MB  peak {rss['peak']:.0f} MB  end {rss['end']:.0f} MB")
+    print("-" * 70)
+    if violations:
+        for v in violations:
+            print(f"⚠️  SLO violated: {v}")
+    else:
+        print("✅ All SLOs met")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test the analysis backends")
+    parser.add_argument("--app", choices=sorted(APPS), default="backend",
+                        help="backend = Backend/main.py, app = ColorAnalyzerApp/backend/main.py")
+    parser.add_argument("--url", help="Test an already running server instead of starting one")
+    parser.add_argument("--server-pid", type=int, help="With --url: pid whose RSS to sample")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--endpoint", default="/analyze")
+    parser.add_argument("--images", help="Directory of images to replay (default: synthetic plates)")
+    parser.add_argument("--synthetic", type=int, default=8, help="Number of synthetic plates")
+    parser.add_argument("--size", type=int, nargs=2, default=(1600, 1200), metavar=("W", "H"),
+                        help="Synthetic plate size")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=0.0, help="Poisson arrivals per second (0 = closed loop)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run (0 = until --requests)")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many requests")
+    parser.add_argument("--warmup", type=int, default=2, help="Requests sent before measuring")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--profile-sample-rate", type=float, default=0.0,
+                        help="PROFILE_SAMPLE_RATE of the started server (default: no sampled profiling)")
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--slo-p99-ms", type=float)
+    parser.add_argument("--slo-p50-ms", type=float)
+    parser.add_argument("--slo-error-rate", type=float, help="Max fraction of failed requests, e.g. 0.01")
+    parser.add_argument("--slo-min-rps", type=float)
+    parser.add_argument("--slo-max-rss-mb", type=float)
+    args = parser.parse_args()
+    if not args.duration and not args.requests:
+        parser.error("set --duration or --requests")
+    return args
+
+if __name__ == "__main__":
+    args = parse_args()
+    images = load_images(args.images, args.synthetic, args.size)
+
+    proc, log, tmp_dir = None, None, None
+    if args.url:
+        base_url = args.url.rstrip("/")
+        server_pid = args.server_pid
+    else:
+        tmp_dir = tempfile.mkdtemp(prefix="load_test_")
+        base_url = f"http://127.0.0.1:{args.port}"
+        proc, log, log_path = start_server(args.app, args.port, tmp_dir, args.profile_sample_rate)
+        server_pid = proc.pid
+        print(f"Started {args.app} server (pid {proc.pid}), log: {log_path}")
+
+    try:
+        wait_healthy(base_url, proc)
+        url = base_url + args.endpoint
+        for i in range(args.warmup):
+            send(url, *images[i % len(images)])
+
+        sampler = RssSampler(server_pid) if server_pid else None
+        if sampler:
+            sampler.start()
+        records, elapsed = run_load(url, images, args.concurrency, args.rate,
+                                    args.duration, args.requests, args.seed)
+        if sampler:
+            sampler.stop()
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+            log.close()
+
+    report = summarize(records, elapsed, sampler.samples if sampler else [])
+    violations = check_slos(report, args)
+    report["config"] = {k: v for k, v in vars(args).items()}
+    report["slo_violations"] = violations
+    print_report(report, violations, args)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if tmp_dir and not violations:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    sys.exit(1 if violations else 0)
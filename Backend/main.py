@@ -1,15 +1,45 @@
-from fastapi import FastAPI, File, UploadFile
+import time
+_import_start = time.perf_counter()
+
+from fastapi import FastAPI, File, UploadFile, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse, FileResponse
+from starlette.concurrency import run_in_threadpool
 import numpy as np
 import cv2
-import time
 import sys
+import os
+import asyncio
+import json
+import shutil
+import tempfile
+from typing import Optional
 
-from well_detect import detect_rows_and_wells
-from feature_extract import extract_R_values
-from predict import predict_concentrations
+from well_detect import detect_rows_and_wells, detect_wells
+from feature_extract import extract_R_values, sample_wells
+from predict import predict_concentrations, merge_predictions, load_models, CALIBRATION_VERSION
+from tiled_detect import open_image_memmap, detect_rows_and_wells_tiled
+from plate_detect import segment_plates, analyze_plates
+from stream_tracker import WellTracker
+from result_store import ResultStore
+from device_profiles import DeviceProfiles
+from job_queue import JobQueue, FINISHED
+from request_profiler import RequestProfiler, PROFILE_HEADER
 
 app = FastAPI()
+result_store = ResultStore()
+device_profiles = DeviceProfiles()
+request_profiler = RequestProfiler()
+
+# Startup timings reported by /health
+STARTUP = {
+    "pid": os.getpid(),
+    "import_s": time.perf_counter() - _import_start,
+    "model_load_s": None,
+    "warmup_s": None,
+    "warmed_in_pid": None
+}
+WARMUP_IMAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reference.jpg")
 
 app.add_middleware(
     CORSMiddleware,
@@ -60,104 +90,521 @@ def extract_color_values_from_image(img, rows):
     
     return color_values
 
+def warm_up():
+    """
+    Load the calibration models and run one full inference on reference.jpg
+    so the OpenCV and NumPy code paths are initialised before the first
+    request. Runs once per process tree: under gunicorn with preload_app it
+    runs in the master before fork (see gunicorn.conf.py) and workers inherit
+    the warmed, read-only pages.
+    """
+    if STARTUP["warmup_s"] is not None:
+        return STARTUP
+
+    t0 = time.perf_counter()
+    load_models()
+    STARTUP["model_load_s"] = time.perf_counter() - t0
+
+    img = cv2.imread(WARMUP_IMAGE)
+    if img is not None:
+        rows = detect_rows_and_wells(img)
+        features, _ = sample_wells(img, rows)
+        extract_color_values_from_image(img, rows[:1])
+        predict_concentrations(features)
+    else:
+        print(f"[STARTUP] WARNING: warm-up image not found: {WARMUP_IMAGE}", flush=True)
+
+    STARTUP["warmup_s"] = time.perf_counter() - t0
+    STARTUP["warmed_in_pid"] = os.getpid()
+    print(f"[STARTUP] Imports {STARTUP['import_s']:.2f}s, model load {STARTUP['model_load_s']:.2f}s, "
+          f"warm-up {STARTUP['warmup_s']:.2f}s", flush=True)
+    return STARTUP
+
+@app.on_event("startup")
+def warm_up_on_startup():
+    warm_up()
+
+@app.get("/health")
+def health():
+    return {"status": "ok", "startup": {**STARTUP, "pid": os.getpid()}}
+
+def is_local_request(request):
+    """
+    Request made directly from this machine. Tunnels and reverse proxies
+    (ngrok, nginx) also connect from loopback but add forwarding headers.
+    """
+    host = request.client.host if request.client else None
+    forwarded = "x-forwarded-for" in request.headers or "forwarded" in request.headers
+    return host in ("127.0.0.1", "::1") and not forwarded
+
+def client_device_id(request):
+    """Device ID sent by the app (X-Device-Id header), else the client address"""
+    device_id = request.headers.get("x-device-id")
+    if device_id:
+        return device_id
+    return request.client.host if request.client else None
+
+@app.get("/metrics/detection")
+def detection_metrics():
+    """Device profile hit rate and how often the Hough fallback was skipped or narrowed (all processes)"""
+    return device_profiles.snapshot()
+
+def analyze_image(img, plate_id=None, device_id=None, source="analyze"):
+    """
+    Full single-plate pipeline on a decoded BGR image. Returns the /analyze
+    response body and records the result.
+    """
+    response, detection = run_analysis(img, device_id)
+    return record_analysis(response, detection, plate_id, device_id, source)
+
+def record_analysis(response, detection, plate_id=None, device_id=None, source="analyze"):
+    """Store an analysis and fold its detection into the device profile; adds analysis_id"""
+    rows, detect_info = detection
+    device_profiles.observe(device_id, rows, detect_info)
+    analysis_id = result_store.record(response["color_values"], plate_id, CALIBRATION_VERSION, source=source)
+    return {"analysis_id": analysis_id, **response}
+
+def run_analysis(img, device_id=None):
+    """
+    Detection, features, predictions and color values, without recording
+    anything. Returns (response body without analysis_id, (rows, detect_info)).
+    """
+    start_time = time.time()
+
+    # -------- STEP 1: WELL DETECTION --------
+    step1_start = time.time()
+    print(f"[STEP 1] Starting well detection...", flush=True)
+    rows, detect_info = device_profiles.detect(img, device_id, observe=False)
+    total_wells = sum(len(r) for r in rows)
+    total_trials = len(rows)
+    print(f"[STEP 1] Well detection completed in {time.time()-step1_start:.2f}s - Found {total_wells} wells in {total_trials} rows (profile: {detect_info['profile']})", flush=True)
+
+    # -------- STEP 2: FEATURE EXTRACTION --------
+    step2_start = time.time()
+    print(f"[STEP 2] Starting feature extraction...", flush=True)
+    features = extract_R_values(img, rows)
+    print(f"[STEP 2] Feature extraction completed in {time.time()-step2_start:.2f}s", flush=True)
+
+    # -------- STEP 3: PREDICTION --------
+    step3_start = time.time()
+    print(f"[STEP 3] Starting predictions...", flush=True)
+    predictions = predict_concentrations(features)
+    print(f"[STEP 3] Predictions completed in {time.time()-step3_start:.2f}s", flush=True)
+
+    # -------- EXTRACT COLOR VALUES --------
+    print(f"[STEP 4] Extracting color values...", flush=True)
+    color_values = extract_color_values_from_image(img, rows)
+
+    # Merge predictions with color values
+    merge_predictions(color_values, predictions)
+
+    # Extract predicted concentrations and channel values
+    predicted_concentrations = [cv["concentration"] for cv in color_values]
+    r_values = [cv["r"] for cv in color_values]
+    s_values = [cv["s_mean"] for cv in color_values]
+    # Default calibration concentrations (0 to 10.0 g/dL)
+    default_concentrations = [0, 0.5, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+    # Use default concentrations for X-axis (pad or truncate as needed)
+    x_axis_concentrations = default_concentrations[:len(color_values)] if len(color_values) <= len(default_concentrations) else default_concentrations + [10.0] * (len(color_values) - len(default_concentrations))
+
+    # -------- FINAL RESPONSE --------
+    total_elapsed = time.time() - start_time
+    print(f"[ANALYZE] Total analysis time: {total_elapsed:.2f}s", flush=True)
+
+    response = {
+        "color_values": color_values,
+        "trial_metrics": {
+            "r2": 0.9788,
+            "mae": 0.3225,
+            "rmse": 0.4506
+        },
+        "r_channel": {
+            "actual_x": x_axis_concentrations,
+            "actual_y": r_values,
+            "coeffs": [0.1, 0.5, 100],
+            "predicted_concentration": predicted_concentrations
+        },
+        "s_channel": {
+            "actual_x": x_axis_concentrations,
+            "actual_y": s_values,
+            "coeffs": [0.1, 0.5, 100],
+            "predicted_concentration": predicted_concentrations
+        },
+        "predictions": predictions,
+        "steps": {
+            "wells_detected": total_wells,
+            "trials_detected": total_trials,
+            "detection_profile": detect_info["profile"],
+            "feature_type": "Mean Red Channel Intensity (inner well region)",
+            "model": "Polynomial Regression (calibrated on reference image)"
+        }
+    }
+    return response, (rows, detect_info)
+
 @app.post("/analyze")
-async def analyze(file: UploadFile = File(...)):
+async def analyze(request: Request, file: UploadFile = File(...), plate_id: Optional[str] = None):
     try:
-        start_time = time.time()
-        
         # -------- READ IMAGE SAFELY (NO cv2.imread) --------
         print(f"[ANALYZE] Starting image analysis...", flush=True)
         image_bytes = await file.read()
         print(f"[ANALYZE] Image bytes read: {len(image_bytes)} bytes", flush=True)
-        
-        np_arr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-        
+
+        profile = request_profiler.wanted(request.headers.get(PROFILE_HEADER), is_local_request(request))
+        with request_profiler.capture("analyze", enabled=profile) as trace:
+            np_arr = np.frombuffer(image_bytes, np.uint8)
+            img = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+
+            if img is None:
+                print("[ANALYZE] ERROR: Failed to decode image", flush=True)
+                return {
+                    "error": "Failed to decode image. Unsupported format or corrupted file."
+                }
+
+            print(f"[ANALYZE] Image decoded: {img.shape}", flush=True)
+
+            response = analyze_image(img, plate_id, client_device_id(request))
+        if trace is not None:
+            response["profile_id"] = trace["name"]
+        return response
+    except Exception as e:
+        print(f"[ERROR] Exception in analyze: {str(e)}", flush=True)
+        import traceback
+        traceback.print_exc()
+        return {
+            "error": f"Processing failed: {str(e)}"
+        }
+
+
+@app.post("/analyze/tiled")
+def analyze_tiled(file: UploadFile = File(...), plate_id: Optional[str] = None):
+    """
+    Analyze a very large scanner image (e.g. a multi-plate TIFF sheet).
+    The upload is streamed to disk and memory-mapped; detection runs on
+    overlapping tiles in parallel, so peak memory follows the tile size.
+    A plain def: FastAPI runs it in the threadpool, so the copy and the
+    detection never block the event loop (/stream, job events, /health).
+    """
+    try:
+        start_time = time.time()
+        print(f"[TILED] Starting tiled analysis...", flush=True)
+
+        suffix = os.path.splitext(file.filename or "")[1] or ".img"
+        with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp_dir:
+            src_path = os.path.join(tmp_dir, "upload" + suffix)
+            with open(src_path, "wb") as out:
+                shutil.copyfileobj(file.file, out, 1 << 20)
+
+            try:
+                img = open_image_memmap(src_path, tmp_dir)
+            except ValueError as e:
+                print(f"[TILED] ERROR: {e}", flush=True)
+                return {"error": str(e)}
+            print(f"[TILED] Image mapped: {img.shape}", flush=True)
+
+            step1_start = time.time()
+            rows, tile_count = detect_rows_and_wells_tiled(img)
+            total_wells = sum(len(r) for r in rows)
+            print(f"[TILED] Detection over {tile_count} tiles completed in {time.time()-step1_start:.2f}s - Found {total_wells} wells in {len(rows)} rows", flush=True)
+
+            step2_start = time.time()
+            features, color_values = sample_wells(img, rows)
+            print(f"[TILED] Well sampling completed in {time.time()-step2_start:.2f}s", flush=True)
+            image_shape = list(img.shape)
+            del img  # release the mapping before the spill file is removed
+
+        predictions = predict_concentrations(features)
+        merge_predictions(color_values, predictions)
+        analysis_id = result_store.record(color_values, plate_id, CALIBRATION_VERSION, source="tiled")
+
+        print(f"[TILED] Total analysis time: {time.time() - start_time:.2f}s", flush=True)
+        return {
+            "analysis_id": analysis_id,
+            "color_values": color_values,
+            "predictions": predictions,
+            "steps": {
+                "image_shape": image_shape,
+                "tiles_processed": tile_count,
+                "wells_detected": total_wells,
+                "trials_detected": len(rows),
+                "feature_type": "Mean Red Channel Intensity (inner well region)",
+                "model": "Polynomial Regression (calibrated on reference image)"
+            }
+        }
+    except Exception as e:
+        print(f"[ERROR] Exception in analyze_tiled: {str(e)}", flush=True)
+        import traceback
+        traceback.print_exc()
+        return {
+            "error": f"Processing failed: {str(e)}"
+        }
+
+
+@app.post("/analyze/plates")
+def analyze_multi_plate(file: UploadFile = File(...), plate_id: Optional[str] = None):
+    """
+    Analyze a photo with several plates side by side.
+    Plates are segmented from the detected wells and analyzed concurrently;
+    results are keyed by plate in reading order (plate_1, plate_2, ...).
+    A plain def so the work runs in the threadpool, not on the event loop.
+    """
+    try:
+        start_time = time.time()
+        print(f"[PLATES] Starting multi-plate analysis...", flush=True)
+        image_bytes = file.file.read()
+        img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+
         if img is None:
-            print("[ANALYZE] ERROR: Failed to decode image", flush=True)
+            print("[PLATES] ERROR: Failed to decode image", flush=True)
             return {
                 "error": "Failed to decode image. Unsupported format or corrupted file."
             }
-        
-        print(f"[ANALYZE] Image decoded: {img.shape}", flush=True)
 
-        # -------- STEP 1: WELL DETECTION --------
         step1_start = time.time()
-        print(f"[STEP 1] Starting well detection...", flush=True)
-        rows = detect_rows_and_wells(img)
-        total_wells = sum(len(r) for r in rows)
-        total_trials = len(rows)
-        print(f"[STEP 1] Well detection completed in {time.time()-step1_start:.2f}s - Found {total_wells} wells in {total_trials} rows", flush=True)
+        blobs = detect_wells(img)
+        plates = segment_plates(img.shape, blobs)
+        print(f"[PLATES] Segmentation completed in {time.time()-step1_start:.2f}s - Found {len(plates)} plates from {len(blobs)} wells", flush=True)
 
-        # -------- STEP 2: FEATURE EXTRACTION --------
         step2_start = time.time()
-        print(f"[STEP 2] Starting feature extraction...", flush=True)
-        features = extract_R_values(img, rows)
-        print(f"[STEP 2] Feature extraction completed in {time.time()-step2_start:.2f}s", flush=True)
+        results = analyze_plates(img, plates)
+        print(f"[PLATES] Per-plate analysis completed in {time.time()-step2_start:.2f}s", flush=True)
 
-        # -------- STEP 3: PREDICTION --------
-        step3_start = time.time()
-        print(f"[STEP 3] Starting predictions...", flush=True)
-        predictions = predict_concentrations(features)
-        print(f"[STEP 3] Predictions completed in {time.time()-step3_start:.2f}s", flush=True)
-
-        # -------- EXTRACT COLOR VALUES --------
-        print(f"[STEP 4] Extracting color values...", flush=True)
-        color_values = extract_color_values_from_image(img, rows)
-        
-        # Merge predictions with color values
-        pred_well_idx = 0
-        for trial_idx, trial_preds in enumerate(predictions):
-            if "concentrations" in trial_preds:
-                for well_idx, conc in enumerate(trial_preds["concentrations"]):
-                    if pred_well_idx < len(color_values):
-                        color_values[pred_well_idx]["concentration"] = float(conc)
-                    pred_well_idx += 1
-
-        # Extract predicted concentrations and channel values
-        predicted_concentrations = [cv["concentration"] for cv in color_values]
-        r_values = [cv["r"] for cv in color_values]
-        s_values = [cv["s_mean"] for cv in color_values]
-        # Default calibration concentrations (0 to 10.0 g/dL)
-        default_concentrations = [0, 0.5, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
-        # Use default concentrations for X-axis (pad or truncate as needed)
-        x_axis_concentrations = default_concentrations[:len(color_values)] if len(color_values) <= len(default_concentrations) else default_concentrations + [10.0] * (len(color_values) - len(default_concentrations))
-
-        # -------- FINAL RESPONSE --------
-        total_elapsed = time.time() - start_time
-        print(f"[ANALYZE] Total analysis time: {total_elapsed:.2f}s", flush=True)
-        
+        for key, res in results.items():
+            res["analysis_id"] = result_store.record(
+                res["color_values"], f"{plate_id}/{key}" if plate_id else key,
+                CALIBRATION_VERSION, source="plates"
+            )
+
+        print(f"[PLATES] Total analysis time: {time.time() - start_time:.2f}s", flush=True)
         return {
-            "color_values": color_values,
-            "trial_metrics": {
-                "r2": 0.9788,
-                "mae": 0.3225,
-                "rmse": 0.4506
-            },
-            "r_channel": {
-                "actual_x": x_axis_concentrations,
-                "actual_y": r_values,
-                "coeffs": [0.1, 0.5, 100],
-                "predicted_concentration": predicted_concentrations
-            },
-            "s_channel": {
-                "actual_x": x_axis_concentrations,
-                "actual_y": s_values,
-                "coeffs": [0.1, 0.5, 100],
-                "predicted_concentration": predicted_concentrations
-            },
-            "predictions": predictions,
+            "plates": results,
             "steps": {
-                "wells_detected": total_wells,
-                "trials_detected": total_trials,
+                "plates_detected": len(plates),
+                "wells_detected": sum(p["wells_detected"] for p in results.values()),
                 "feature_type": "Mean Red Channel Intensity (inner well region)",
                 "model": "Polynomial Regression (calibrated on reference image)"
             }
         }
     except Exception as e:
-        print(f"[ERROR] Exception in analyze: {str(e)}", flush=True)
+        print(f"[ERROR] Exception in analyze_multi_plate: {str(e)}", flush=True)
         import traceback
         traceback.print_exc()
         return {
             "error": f"Processing failed: {str(e)}"
         }
+
+
+@app.websocket("/stream")
+async def stream(websocket: WebSocket):
+    """
+    Live-preview streaming: the client sends encoded camera frames (JPEG/PNG
+    bytes) and receives one JSON reading per processed frame. If frames
+    arrive faster than they can be processed, only the newest is kept.
+    """
+    await websocket.accept()
+    print(f"[STREAM] Client connected", flush=True)
+    tracker = WellTracker()
+    latest = {"frame": None, "dropped": 0}
+    frame_ready = asyncio.Event()
+
+    async def receive_frames():
+        while True:
+            data = await websocket.receive_bytes()
+            if latest["frame"] is not None:
+                latest["dropped"] += 1
+            latest["frame"] = data
+            frame_ready.set()
+
+    def process_frame(data):
+        # Decoding a full-resolution JPEG takes tens of ms: keep it off the event loop too
+        img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        return None if img is None else tracker.process(img)
+
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        while True:
+            waiter = asyncio.create_task(frame_ready.wait())
+            await asyncio.wait({waiter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver.done():
+                waiter.cancel()
+                receiver.result()  # re-raises WebSocketDisconnect
+            frame_ready.clear()
+            data, latest["frame"] = latest["frame"], None
+
+            result = await run_in_threadpool(process_frame, data)
+            if result is None:
+                await websocket.send_json({"error": "Failed to decode frame"})
+                continue
+            result["dropped_frames"] = latest["dropped"]
+            await websocket.send_json(result)
+    except WebSocketDisconnect:
+        print(f"[STREAM] Client disconnected after {tracker.frame_index} frames", flush=True)
+    finally:
+        receiver.cancel()
+
+
+@app.get("/results")
+def list_results(start: Optional[float] = None, end: Optional[float] = None,
+                 plate_id: Optional[str] = None, trial: Optional[int] = None,
+                 calibration_version: Optional[str] = None,
+                 limit: int = 100, offset: int = 0):
+    """Page through stored per-well results (newest first). start/end are Unix timestamps."""
+    return result_store.query(limit=limit, offset=offset, start=start, end=end, plate_id=plate_id,
+                              trial=trial, calibration_version=calibration_version)
+
+
+@app.get("/results/summary")
+def summarize_results(start: Optional[float] = None, end: Optional[float] = None,
+                      plate_id: Optional[str] = None, trial: Optional[int] = None,
+                      calibration_version: Optional[str] = None):
+    """Mean and CV of predicted concentration per concentration level, computed in the store"""
+    return result_store.summarize(start=start, end=end, plate_id=plate_id,
+                                  trial=trial, calibration_version=calibration_version)
+
+
+@app.on_event("startup")
+def start_job_workers():
+    # Per process: under gunicorn every worker takes jobs from the shared queue
+    job_queue.start()
+
+@app.on_event("shutdown")
+def flush_result_store():
+    result_store.flush()
+
+
+def run_job(image_bytes, plate_id=None, device_id=None, profile=False):
+    """Job queue handler: decode and run the /analyze pipeline (nothing is recorded yet)"""
+    with request_profiler.capture("job", enabled=profile or request_profiler.wanted()) as trace:
+        img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError("Failed to decode image. Unsupported format or corrupted file.")
+        print(f"[JOBS] Running job on image {img.shape}", flush=True)
+        response, detection = run_analysis(img, device_id)
+    if trace is not None:
+        response["profile_id"] = trace["name"]
+    return response, detection
+
+def commit_job(output, plate_id=None, device_id=None, profile=False):
+    """Job queue commit: record a finished job that was not cancelled"""
+    response, detection = output
+    return record_analysis(response, detection, plate_id, device_id, source="job")
+
+job_queue = JobQueue(run_job, commit_job)
+
+SSE_POLL_INTERVAL = 0.25    # Seconds between job status checks on an event stream
+SSE_KEEPALIVE = 15          # Seconds between keep-alive comments (stops tunnels timing out)
+
+
+@app.post("/jobs")
+async def submit_job(request: Request, file: UploadFile = File(...), priority: str = "interactive",
+                     plate_id: Optional[str] = None):
+    """
+    Queue an analysis and return immediately with a job ID. Poll
+    GET /jobs/{id} or follow GET /jobs/{id}/events for the result.
+    priority is "interactive" (app uploads) or "bulk" (archive reprocessing).
+    """
+    image_bytes = await file.read()
+    if not image_bytes:
+        return JSONResponse({"error": "Empty file"}, status_code=400)
+    params = {"plate_id": plate_id, "device_id": client_device_id(request)}
+    if request_profiler.authorized(request.headers.get(PROFILE_HEADER), is_local_request(request)):
+        params["profile"] = True
+    try:
+        # Off the event loop: the insert may wait for another process's write lock
+        job, deduplicated = await run_in_threadpool(job_queue.submit, image_bytes, priority, **params)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    print(f"[JOBS] Job {job.id} {'deduplicated' if deduplicated else 'queued'} ({priority})", flush=True)
+    return JSONResponse({**job.to_dict(include_result=False), "deduplicated": deduplicated,
+                         "queue_position": job_queue.position(job)}, status_code=202)
+
+
+@app.get("/metrics/jobs")
+def job_metrics():
+    """Queue depth per priority, wait times and job counters"""
+    return job_queue.metrics()
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Unknown job"}, status_code=404)
+    return {**job.to_dict(), "queue_position": job_queue.position(job)}
+
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return JSONResponse({"error": "Unknown job"}, status_code=404)
+    return job.to_dict(include_result=False)
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-sent events: one "status" event per status change, the last one carries the result"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Unknown job"}, status_code=404)
+
+    async def events():
+        last_status = None
+        last_sent = time.time()
+        while True:
+            # Re-read every poll: the job may be running in another server process
+            current = job_queue.get(job_id)
+            if current is None:
+                return
+            status = current.status
+            if status != last_status:
+                last_status = status
+                last_sent = time.time()
+                yield f"event: status\ndata: {json.dumps(current.to_dict())}\n\n"
+                if status in FINISHED:
+                    return
+            elif time.time() - last_sent > SSE_KEEPALIVE:
+                last_sent = time.time()
+                yield ": keepalive\n\n"
+            await asyncio.sleep(SSE_POLL_INTERVAL)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def profile_admin_allowed(request):
+    """Admin endpoints need X-Profile: <PROFILE_TOKEN>, or a local request when no token is set"""
+    if request_profiler.token is not None:
+        return request.headers.get(PROFILE_HEADER) == request_profiler.token
+    return is_local_request(request)
+
+@app.get("/admin/profiles")
+def list_profiles(request: Request):
+    """Saved request traces, newest first"""
+    if not profile_admin_allowed(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    return {"sample_rate": request_profiler.sample_rate, "profiles": request_profiler.list()}
+
+@app.get("/admin/profiles/{name}")
+def get_profile(request: Request, name: str, format: str = "summary"):
+    """
+    One saved trace. format=summary (top functions, JSON), collapsed
+    (flame graph / speedscope input) or prof (pstats file, for snakeviz).
+    """
+    if not profile_admin_allowed(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    if format == "summary":
+        summary = request_profiler.summary(name)
+        if summary is None:
+            return JSONResponse({"error": "Unknown profile"}, status_code=404)
+        return summary
+    if format not in ("collapsed", "prof"):
+        return JSONResponse({"error": "format must be summary, collapsed or prof"}, status_code=400)
+
+    path = request_profiler.path(name, "." + format)
+    if path is None:
+        return JSONResponse({"error": "Unknown profile"}, status_code=404)
+    if format == "collapsed":
+        with open(path) as f:
+            return PlainTextResponse(f.read())
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{name}.prof")
@@ -0,0 +1,95 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from well_detect import cluster_rows, EXPECTED_COLS
+from feature_extract import sample_wells
+from predict import predict_concentrations, merge_predictions
+
+# ==== CONSTANTS ====
+PLATE_JOIN_RADII = 1.5  # Dilation (in well radii) that bridges wells of one plate, not the gap between plates
+MIN_PLATE_WELLS = EXPECTED_COLS  # Smaller groups are stray blobs, not plates
+MASK_WELL_RADIUS = 4    # Wells are drawn at ~4px radius so the plate mask stays small
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+# ==== PLATE SEGMENTATION ====
+
+def segment_plates(img_shape, blobs, join_radii=PLATE_JOIN_RADII, min_wells=MIN_PLATE_WELLS):
+    """
+    Group detected well blobs into plates.
+    Wells are drawn on a downscaled mask and dilated by `join_radii` well
+    radii, so neighbouring wells of one plate fuse while plates separated by
+    a wider margin stay apart; each connected component is one plate.
+
+    Returns plates ordered top-to-bottom, left-to-right as
+    [{"bbox": (x, y, w, h), "blobs": [(x, y, r), ...]}, ...]
+    """
+    if not blobs:
+        return []
+
+    med_r = float(np.median([b[2] for b in blobs]))
+    scale = min(1.0, MASK_WELL_RADIUS / max(med_r, 1.0))
+    h, w = img_shape[:2]
+    mask = np.zeros((max(1, int(h * scale)), max(1, int(w * scale))), dtype=np.uint8)
+    for x, y, r in blobs:
+        cv2.circle(mask, (int(x * scale), int(y * scale)), max(1, int(r * scale)), 255, -1)
+
+    k = 2 * int(round(join_radii * med_r * scale)) + 1
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (k, k))
+    mask = cv2.dilate(mask, kernel, iterations=1)
+    _, labels = cv2.connectedComponents(mask, connectivity=8)
+
+    groups = {}
+    for blob in blobs:
+        lx = min(mask.shape[1] - 1, int(blob[0] * scale))
+        ly = min(mask.shape[0] - 1, int(blob[1] * scale))
+        groups.setdefault(int(labels[ly, lx]), []).append(blob)
+
+    plates = []
+    for members in groups.values():
+        if len(members) < min_wells:
+            continue
+        x0 = min(b[0] - b[2] for b in members)
+        y0 = min(b[1] - b[2] for b in members)
+        x1 = max(b[0] + b[2] for b in members)
+        y1 = max(b[1] + b[2] for b in members)
+        plates.append({"bbox": (x0, y0, x1 - x0, y1 - y0), "blobs": members})
+
+    return _reading_order(plates)
+
+def _reading_order(plates):
+    """Sort plates into bands by vertical overlap, then left-to-right within a band"""
+    bands = []
+    for plate in sorted(plates, key=lambda p: p["bbox"][1]):
+        _, y, _, ph = plate["bbox"]
+        if bands and y < bands[-1]["bottom"] - ph / 2:
+            bands[-1]["plates"].append(plate)
+            bands[-1]["bottom"] = max(bands[-1]["bottom"], y + ph)
+        else:
+            bands.append({"bottom": y + ph, "plates": [plate]})
+    return [p for band in bands for p in sorted(band["plates"], key=lambda p: p["bbox"][0])]
+
+# ==== PER-PLATE ANALYSIS ====
+
+def analyze_plate(img, plate):
+    """Rows -> features -> predictions for a single plate's blobs"""
+    blobs = sorted(set(plate["blobs"]), key=lambda b: (b[1], b[0]))
+    rows = cluster_rows(blobs)
+    features, color_values = sample_wells(img, rows)
+    predictions = predict_concentrations(features)
+    merge_predictions(color_values, predictions)
+    return {
+        "bbox": [int(v) for v in plate["bbox"]],
+        "color_values": color_values,
+        "predictions": predictions,
+        "wells_detected": sum(len(r) for r in rows),
+        "trials_detected": len(rows)
+    }
+
+def analyze_plates(img, plates, workers=MAX_WORKERS):
+    """Analyze plates concurrently; returns {"plate_1": {...}, "plate_2": {...}, ...}"""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda p: analyze_plate(img, p), plates))
+    return {f"plate_{i + 1}": res for i, res in enumerate(results)}
@@ -1,11 +1,67 @@
-import joblib
+import hashlib
+import json
 import numpy as np
 import os
+import threading
 
-# Load trained calibration models
 script_dir = os.path.dirname(os.path.abspath(__file__))
-poly = joblib.load(os.path.join(script_dir, "calibration_poly.pkl"))
-model = joblib.load(os.path.join(script_dir, "calibration_model.pkl"))
+COEFFS_PATH = os.path.join(script_dir, "calibration_coeffs.json")
+
+# Calibration polynomial, loaded on first use: (powers, coef, intercept)
+calibration = None
+_load_lock = threading.Lock()
+
+def _calibration_version():
+    """Short content hash of the calibration pickles, stored with every result"""
+    digest = hashlib.sha1()
+    for name in ("calibration_poly.pkl", "calibration_model.pkl"):
+        with open(os.path.join(script_dir, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+CALIBRATION_VERSION = _calibration_version()
+
+def _coeffs_from_pickles():
+    """
+    Unpickle the sklearn models and pull out the fitted polynomial:
+    PolynomialFeatures powers plus LinearRegression coef_ and intercept_.
+    Importing joblib/sklearn takes about a second, so this only runs when
+    calibration_coeffs.json is missing or was made from other pickles.
+    """
+    import joblib
+    poly = joblib.load(os.path.join(script_dir, "calibration_poly.pkl"))
+    model = joblib.load(os.path.join(script_dir, "calibration_model.pkl"))
+    return {
+        "calibration_version": CALIBRATION_VERSION,
+        "powers": np.asarray(poly.powers_).reshape(-1).tolist(),
+        "coef": np.asarray(model.coef_, dtype=np.float64).reshape(-1).tolist(),
+        "intercept": float(np.asarray(model.intercept_).reshape(-1)[0])
+    }
+
+def load_models():
+    """
+    Load the calibration once; safe to call from several threads.
+    Reads calibration_coeffs.json when it matches the pickles (no sklearn
+    import), otherwise extracts it from the pickles and rewrites the file.
+    """
+    global calibration
+    if calibration is None:
+        with _load_lock:
+            if calibration is None:
+                coeffs = None
+                if os.path.exists(COEFFS_PATH):
+                    with open(COEFFS_PATH) as f:
+                        coeffs = json.load(f)
+                if coeffs is None or coeffs.get("calibration_version") != CALIBRATION_VERSION:
+                    print("[PREDICT] Calibration pickles changed; extracting coefficients", flush=True)
+                    coeffs = _coeffs_from_pickles()
+                    try:
+                        with open(COEFFS_PATH, "w") as f:
+                            json.dump(coeffs, f, indent=2)
+                    except OSError as e:
+                        print(f"[PREDICT] WARNING: could not write {COEFFS_PATH}: {e}", flush=True)
+                calibration = (np.array(coeffs["powers"]), np.array(coeffs["coef"]), coeffs["intercept"])
+    return calibration
 
 def predict_concentrations(features):
     """
@@ -22,6 +78,7 @@ def predict_concentrations(features):
     Returns predictions in same format as training.
     Predicts concentration for all wells (no control wells skipped).
     """
+    powers, coef, intercept = load_models()
     all_predictions = []
 
     for trial_data in features:
@@ -34,9 +91,9 @@ def predict_concentrations(features):
             # Ensure scalar float
             R = float(R)
             
-            # Transform using polynomial features and predict
-            X = poly.transform([[R]])
-            concentration = model.predict(X)[0]
+            # Polynomial features (R, R^2, ...) times the fitted coefficients,
+            # as PolynomialFeatures.transform + LinearRegression.predict would
+            concentration = np.power(R, powers) @ coef + intercept
             
             # Round to 6 decimal places to match notebook precision
             trial_predictions.append(round(float(concentration), 6))
@@ -47,3 +104,14 @@ def predict_concentrations(features):
         })
 
     return all_predictions
+
+def merge_predictions(color_values, predictions):
+    """Copy predicted concentrations onto the matching color value entries"""
+    pred_well_idx = 0
+    for trial_idx, trial_preds in enumerate(predictions):
+        if "concentrations" in trial_preds:
+            for well_idx, conc in enumerate(trial_preds["concentrations"]):
+                if pred_well_idx < len(color_values):
+                    color_values[pred_well_idx]["concentration"] = float(conc)
+                pred_well_idx += 1
+    return color_values
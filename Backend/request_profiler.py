@@ -0,0 +1,202 @@
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# ==== CONSTANTS ====
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(script_dir, "profiles"))
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))  # Fraction of requests profiled
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN")   # X-Profile must carry it; unset = loopback clients only
+PROFILE_HEADER = "x-profile"
+MAX_SAVED_PROFILES = 200    # Oldest traces are deleted beyond this
+MIN_STACK_US = 10           # Collapsed stacks shorter than this (microseconds) are dropped
+TOP_FUNCTIONS = 25          # Functions listed in a trace summary
+
+NAME_RE = re.compile(r"^[0-9]{8}-[0-9]{6}_[a-z_]+_[0-9a-f]{8}$")
+
+def _label(func):
+    filename, line, name = func
+    if filename == "~":
+        return name.strip("<>")     # built-ins and C extensions, e.g. "HoughCircles", "built-in method numpy.zeros"
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+def collapsed_stacks(stats):
+    """
+    Convert pstats to collapsed stacks ("root;child;leaf <microseconds>"),
+    the input format of flamegraph.pl and speedscope.
+
+    cProfile only records caller -> callee edges, not full stacks, so a
+    function's time is split between its callers in proportion to the time
+    each caller spent in it (the same approximation flameprof makes).
+    """
+    raw = stats.stats
+    roots = [f for f, (_, _, _, _, callers) in raw.items()
+             if not any(c in raw for c in callers)]
+    callees = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    out = {}
+    def walk(func, path, time_s):
+        cumtime = raw[func][3]
+        share = time_s / cumtime if cumtime else 0.0
+        stack = path + [_label(func)]
+        self_us = int(raw[func][2] * share * 1e6)
+        if self_us >= MIN_STACK_US:
+            key = ";".join(stack)
+            out[key] = out.get(key, 0) + self_us
+        for callee, edge_cumtime in callees.get(func, []):
+            if _label(callee) in stack:
+                continue    # recursion; its time is already in the caller's cumtime
+            walk(callee, stack, edge_cumtime * share)
+
+    for root in roots:
+        walk(root, [], raw[root][3])
+    return [f"{stack} {us}" for stack, us in sorted(out.items())]
+
+class RequestProfiler:
+    """
+    Opt-in cProfile capture of single requests.
+
+    A request is profiled when it carries an authorized X-Profile header, or
+    at random with probability PROFILE_SAMPLE_RATE. X-Profile (and access to
+    saved traces) is authorized when it equals PROFILE_TOKEN, or, with no
+    token configured, only for requests made directly from this machine.
+    cProfile records C calls too, so cv2 time shows up by function name next
+    to the NumPy clustering (dbscan_1d) and prediction. Only one request
+    is profiled at a time per process; others run unprofiled meanwhile.
+    Each trace is saved as <name>.prof (pstats, for snakeviz), <name>.collapsed
+    (flame graph input) and <name>.json (summary).
+    """
+
+    def __init__(self, directory=PROFILE_DIR, sample_rate=PROFILE_SAMPLE_RATE, token=PROFILE_TOKEN):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.token = token
+        self.lock = threading.Lock()
+
+    def authorized(self, header_value, local):
+        """
+        May this request trigger profiling or read traces? `local` is whether
+        it came straight from loopback (not through a proxy or tunnel).
+        """
+        if self.token is not None:
+            return header_value == self.token
+        return bool(header_value) and local
+
+    def wanted(self, header_value=None, local=False):
+        """Profile this request? (authorized header, else sampling)"""
+        if self.authorized(header_value, local):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @contextmanager
+    def capture(self, source, enabled=True):
+        """
+        Profile the block. Yields a dict that gets the trace "name" once it is
+        saved, or None when not profiling (disabled, or another capture running).
+        """
+        if not enabled or not self.lock.acquire(blocking=False):
+            yield None
+            return
+
+        trace = {"name": None}
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Another profiler is active in this process (Python 3.12+ allows only one)
+            print(f"[PROFILE] WARNING: could not start profiler: {e}", flush=True)
+            self.lock.release()
+            yield None
+            return
+
+        try:
+            yield trace
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - start
+            try:
+                trace["name"] = self._save(profiler, source, elapsed)
+                print(f"[PROFILE] Saved {trace['name']} ({elapsed:.2f}s)", flush=True)
+            except Exception as e:
+                print(f"[PROFILE] ERROR: failed to save trace: {e}", flush=True)
+            finally:
+                self.lock.release()
+
+    def _save(self, profiler, source, elapsed):
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}_{source}_{uuid.uuid4().hex[:8]}"
+        base = os.path.join(self.directory, name)
+
+        stats = pstats.Stats(profiler)
+        stats.dump_stats(base + ".prof")
+        with open(base + ".collapsed", "w") as f:
+            f.write("\n".join(collapsed_stacks(stats)) + "\n")
+
+        top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]
+        summary = {
+            "name": name,
+            "source": source,
+            "created_at": time.time(),
+            "elapsed_s": elapsed,
+            "top_cumulative": [
+                {"function": _label(func), "calls": nc, "tottime_s": tt, "cumtime_s": ct}
+                for func, (_, nc, tt, ct, _) in top
+            ]
+        }
+        with open(base + ".json", "w") as f:
+            json.dump(summary, f, indent=2)
+
+        self._prune()
+        return name
+
+    def _prune(self):
+        names = self.list_names()
+        for name in names[:max(0, len(names) - MAX_SAVED_PROFILES)]:
+            for ext in (".prof", ".collapsed", ".json"):
+                try:
+                    os.remove(os.path.join(self.directory, name + ext))
+                except FileNotFoundError:
+                    pass
+
+    def list_names(self):
+        """Saved trace names, oldest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(f[:-5] for f in os.listdir(self.directory)
+                      if f.endswith(".json") and NAME_RE.match(f[:-5]))
+
+    def list(self):
+        """Summaries of saved traces (without the function table), newest first"""
+        traces = []
+        for name in reversed(self.list_names()):
+            summary = self.summary(name)
+            if summary:
+                summary.pop("top_cumulative", None)
+                traces.append(summary)
+        return traces
+
+    def path(self, name, ext):
+        """File of a saved trace, or None if the name is invalid or unknown"""
+        if not NAME_RE.match(name):
+            return None
+        path = os.path.join(self.directory, name + ext)
+        return path if os.path.exists(path) else None
+
+    def summary(self, name):
+        path = self.path(name, ".json")
+        if path is None:
+            return None
+        with open(path) as f:
+            return json.load(f)
@@ -0,0 +1,187 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# ==== CONSTANTS ====
+RESULT_DB_PATH = os.environ.get("RESULT_DB_PATH", os.path.join(script_dir, "results.db"))
+BATCH_SIZE = 256            # Max analyses written per transaction
+FLUSH_INTERVAL = 0.5        # Seconds the writer waits for more work before committing
+MAX_PAGE_SIZE = 1000
+# Nominal concentration (g/dL) of each well position in a trial row
+CONCENTRATION_LEVELS = [0, 0.5, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    plate_id TEXT,
+    calibration_version TEXT,
+    source TEXT,
+    wells INTEGER,
+    trials INTEGER
+);
+CREATE TABLE IF NOT EXISTS wells (
+    analysis_id TEXT NOT NULL REFERENCES analyses(id),
+    created_at REAL NOT NULL,
+    plate_id TEXT,
+    calibration_version TEXT,
+    trial INTEGER,
+    well INTEGER,
+    level REAL,
+    r REAL, g REAL, b REAL, s_mean REAL,
+    concentration REAL
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_created ON analyses(created_at);
+CREATE INDEX IF NOT EXISTS idx_wells_created ON wells(created_at);
+CREATE INDEX IF NOT EXISTS idx_wells_plate ON wells(plate_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_wells_trial ON wells(trial, created_at);
+CREATE INDEX IF NOT EXISTS idx_wells_calibration ON wells(calibration_version, created_at);
+CREATE INDEX IF NOT EXISTS idx_wells_analysis ON wells(analysis_id);
+"""
+
+def _well_rows(analysis_id, created_at, plate_id, calibration_version, color_values):
+    """Flatten color_values into wells table rows, tagging each with its nominal level"""
+    rows = []
+    position = {}
+    for cv in color_values:
+        col = position.get(cv["trial"], 0)
+        position[cv["trial"]] = col + 1
+        level = CONCENTRATION_LEVELS[col] if col < len(CONCENTRATION_LEVELS) else None
+        rows.append((analysis_id, created_at, plate_id, calibration_version,
+                     cv["trial"], cv["well"], level,
+                     cv["r"], cv["g"], cv["b"], cv["s_mean"], cv["concentration"]))
+    return rows
+
+def _where(start=None, end=None, plate_id=None, trial=None, calibration_version=None):
+    clauses, params = [], []
+    if start is not None:
+        clauses.append("created_at >= ?")
+        params.append(start)
+    if end is not None:
+        clauses.append("created_at < ?")
+        params.append(end)
+    if plate_id is not None:
+        clauses.append("plate_id = ?")
+        params.append(plate_id)
+    if trial is not None:
+        clauses.append("trial = ?")
+        params.append(trial)
+    if calibration_version is not None:
+        clauses.append("calibration_version = ?")
+        params.append(calibration_version)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+class ResultStore:
+    """
+    SQLite (WAL mode) store of analysis results.
+
+    record() only enqueues; a background thread writes queued analyses in
+    batched transactions, so the request path never waits on disk.
+    """
+
+    def __init__(self, path=RESULT_DB_PATH):
+        self.path = path
+        self.queue = queue.Queue()
+        self._writer = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _ensure_writer(self):
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name="result-store-writer", daemon=True)
+                self._writer.start()
+
+    def record(self, color_values, plate_id=None, calibration_version=None, source="analyze"):
+        """Queue one analysis for writing and return its id"""
+        analysis_id = uuid.uuid4().hex
+        self.queue.put((analysis_id, time.time(), plate_id, calibration_version, source, color_values))
+        self._ensure_writer()
+        return analysis_id
+
+    def flush(self):
+        """Block until everything queued so far is committed"""
+        if self._writer is not None:
+            self.queue.join()
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.time() + FLUSH_INTERVAL
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.time())))
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(conn, batch)
+            except Exception as e:
+                print(f"[STORE] ERROR: failed to write {len(batch)} analyses: {e}", flush=True)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _write_batch(self, conn, batch):
+        analyses, wells = [], []
+        for analysis_id, created_at, plate_id, calibration_version, source, color_values in batch:
+            trials = len({cv["trial"] for cv in color_values})
+            analyses.append((analysis_id, created_at, plate_id, calibration_version, source, len(color_values), trials))
+            wells.extend(_well_rows(analysis_id, created_at, plate_id, calibration_version, color_values))
+        with conn:
+            conn.executemany("INSERT INTO analyses VALUES (?, ?, ?, ?, ?, ?, ?)", analyses)
+            conn.executemany("INSERT INTO wells VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", wells)
+
+    def query(self, limit=100, offset=0, **filters):
+        """Page through stored wells (newest first) matching the filters"""
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        where, params = _where(**filters)
+        conn = self._connect()
+        try:
+            conn.row_factory = sqlite3.Row
+            total = conn.execute(f"SELECT COUNT(*) FROM wells{where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT * FROM wells{where} ORDER BY created_at DESC, analysis_id, well LIMIT ? OFFSET ?",
+                params + [limit, int(offset)]
+            ).fetchall()
+        finally:
+            conn.close()
+        return {"total": total, "limit": limit, "offset": int(offset), "rows": [dict(r) for r in rows]}
+
+    def summarize(self, **filters):
+        """Mean, std and CV of predicted concentration per nominal concentration level"""
+        where, params = _where(**filters)
+        conn = self._connect()
+        try:
+            stats = conn.execute(
+                f"SELECT level, COUNT(*), SUM(concentration), SUM(concentration * concentration), AVG(r) "
+                f"FROM wells{where} GROUP BY level ORDER BY level",
+                params
+            ).fetchall()
+        finally:
+            conn.close()
+
+        levels = []
+        for level, n, total, total_sq, mean_r in stats:
+            mean = total / n
+            std = max(0.0, total_sq / n - mean * mean) ** 0.5
+            levels.append({
+                "level": level,
+                "n": n,
+                "mean_concentration": mean,
+                "std_concentration": std,
+                "cv": std / abs(mean) if mean else None,
+                "mean_r": mean_r
+            })
+        return {"levels": levels}
@@ -0,0 +1,117 @@
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from well_detect import detect_rows_and_wells
+from feature_extract import sample_wells
+from predict import predict_concentrations, merge_predictions
+
+# ==== CONSTANTS ====
+KEYFRAME_INTERVAL = 30      # Full detection at least every N frames
+TRACK_SCALE = 0.5           # Frames are downscaled by this for motion estimation
+MIN_TRACK_RESPONSE = 0.1    # phaseCorrelate peak below this -> tracking lost, redo detection
+STABILITY_WINDOW = 10       # Frames of history used for the stability indicator
+STABLE_STD = 0.1            # Max per-well concentration std (g/dL) to call a reading stable
+
+class WellTracker:
+    """
+    Tracks well positions across a stream of camera frames.
+
+    Full detection (detect_rows_and_wells) only runs on keyframes; between
+    keyframes the global frame shift is estimated by phase correlation on a
+    downscaled grayscale frame and the keyframe wells are moved by it.
+    """
+
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL, window=STABILITY_WINDOW):
+        self.keyframe_interval = keyframe_interval
+        self.window = window
+        self.frame_index = 0
+        self.rows = []              # wells as detected on the last keyframe
+        self.offset = (0.0, 0.0)    # accumulated shift since the last keyframe
+        self.frames_since_key = 0
+        self.prev_gray = None
+        self.hann = None
+        self.history = []           # one deque of recent concentrations per well
+
+    def _small_gray(self, img):
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(gray, None, fx=TRACK_SCALE, fy=TRACK_SCALE, interpolation=cv2.INTER_AREA)
+        return np.float32(small)
+
+    def _current_rows(self):
+        ox, oy = self.offset
+        return [[(int(round(x + ox)), int(round(y + oy)), r) for x, y, r in row]
+                for row in self.rows]
+
+    def _needs_keyframe(self, gray):
+        return (not self.rows
+                or self.prev_gray is None
+                or self.prev_gray.shape != gray.shape
+                or self.frames_since_key >= self.keyframe_interval)
+
+    def process(self, img):
+        """Update tracking with one BGR frame and return per-well readings"""
+        start = time.time()
+        self.frame_index += 1
+        gray = self._small_gray(img)
+
+        keyframe = self._needs_keyframe(gray)
+        response = None
+        if not keyframe:
+            if self.hann is None or self.hann.shape != gray.shape:
+                self.hann = cv2.createHanningWindow(gray.shape[::-1], cv2.CV_32F)
+            (dx, dy), response = cv2.phaseCorrelate(self.prev_gray, gray, self.hann)
+            if response < MIN_TRACK_RESPONSE:
+                keyframe = True
+            else:
+                self.offset = (self.offset[0] + dx / TRACK_SCALE, self.offset[1] + dy / TRACK_SCALE)
+                self.frames_since_key += 1
+
+        if keyframe:
+            self.rows = detect_rows_and_wells(img)
+            self.offset = (0.0, 0.0)
+            self.frames_since_key = 0
+
+        self.prev_gray = gray
+        rows = self._current_rows()
+
+        features, color_values = sample_wells(img, rows)
+        predictions = predict_concentrations(features)
+        merge_predictions(color_values, predictions)
+
+        wells = [w for row in rows for w in row]
+        for cv, (x, y, r) in zip(color_values, wells):
+            cv.update({"x": x, "y": y, "radius": r})
+
+        return {
+            "frame": self.frame_index,
+            "keyframe": keyframe,
+            "track_response": None if response is None else float(response),
+            "offset": [float(self.offset[0]), float(self.offset[1])],
+            "color_values": color_values,
+            "stability": self._update_stability(color_values),
+            "elapsed_ms": (time.time() - start) * 1000
+        }
+
+    def _update_stability(self, color_values):
+        """Per-well rolling std of predicted concentration; stable when all wells settle"""
+        if len(self.history) != len(color_values):
+            # Well layout changed (new keyframe found a different plate); start over
+            self.history = [deque(maxlen=self.window) for _ in color_values]
+
+        for hist, cv in zip(self.history, color_values):
+            hist.append(cv["concentration"])
+
+        filled = min((len(h) for h in self.history), default=0)
+        stds = [float(np.std(h)) for h in self.history]
+        max_std = max(stds, default=0.0)
+        stable_wells = sum(1 for s in stds if s <= STABLE_STD)
+        return {
+            "stable": bool(self.history) and filled >= self.window and max_std <= STABLE_STD,
+            "max_std": max_std,
+            "stable_wells": stable_wells,
+            "total_wells": len(self.history),
+            "frames_in_window": filled
+        }
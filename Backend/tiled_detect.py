@@ -0,0 +1,158 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from well_detect import detect_wells, cluster_rows, hough_fallback, merge_blobs, EXPECTED_COLS
+
+try:
+    import tifffile
+except ImportError:  # listed in requirements.txt; without it TIFFs are fully decoded
+    tifffile = None
+
+# ==== CONSTANTS ====
+TILE_SIZE = 2048        # Tile edge in pixels (bounds per-worker memory)
+TILE_OVERLAP = 160      # Initial overlap; grown to the largest well diameter found (see required_overlap)
+SEAM_MARGIN = 4         # Extra pixels per side when sizing the overlap from a well radius
+MAX_WORKERS = min(8, os.cpu_count() or 1)
+
+# ==== IMAGE ACCESS ====
+
+def open_image_memmap(path, spill_dir):
+    """
+    Open an image as a read-only (H, W, 3) BGR array backed by a file on disk.
+
+    .npy files and uncompressed TIFFs (when tifffile is installed) are mapped
+    directly. Anything else is decoded once with OpenCV and spilled to a .npy
+    file in `spill_dir`, so every later tile read comes from the page cache.
+    """
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext == ".npy":
+        return _as_bgr(np.load(path, mmap_mode="r"), rgb=False)
+
+    if ext in (".tif", ".tiff"):
+        if tifffile is None:
+            print("[TILED] WARNING: tifffile not installed; decoding the whole TIFF in memory "
+                  "(peak memory = sheet size). pip install tifffile", flush=True)
+        else:
+            try:
+                return _as_bgr(tifffile.memmap(path, mode="r"), rgb=True)
+            except ValueError as e:
+                print(f"[TILED] WARNING: TIFF cannot be memory-mapped ({e}); decoding the whole "
+                      f"image in memory. Save scans as uncompressed, untiled TIFF to avoid this", flush=True)
+    else:
+        print(f"[TILED] Decoding {ext or 'image'} in memory before tiling; only .npy and "
+              f"uncompressed TIFF are mapped directly", flush=True)
+
+    decoded = cv2.imread(path, cv2.IMREAD_COLOR)
+    if decoded is None:
+        raise ValueError("Failed to decode image. Unsupported format or corrupted file.")
+
+    spill_path = os.path.join(spill_dir, "decoded.npy")
+    spill = np.lib.format.open_memmap(spill_path, mode="w+", dtype=np.uint8, shape=decoded.shape)
+    spill[:] = decoded
+    spill.flush()
+    del spill, decoded
+    return np.load(spill_path, mmap_mode="r")
+
+def _as_bgr(arr, rgb):
+    """View a mapped array as 3-channel BGR without copying"""
+    if arr.ndim != 3 or arr.shape[2] < 3 or arr.dtype != np.uint8:
+        raise ValueError(f"Expected an 8-bit colour image, got {arr.dtype} {arr.shape}")
+    return arr[:, :, 2::-1] if rgb else arr[:, :, :3]
+
+def iter_tiles(shape, tile=TILE_SIZE, overlap=TILE_OVERLAP):
+    """Yield (x0, y0, x1, y1) bounds of overlapping tiles covering an image"""
+    h, w = shape[:2]
+    step = tile - overlap
+    for y0 in range(0, max(1, h - overlap), step):
+        for x0 in range(0, max(1, w - overlap), step):
+            yield x0, y0, min(w, x0 + tile), min(h, y0 + tile)
+
+# ==== TILED DETECTION ====
+
+def detect_tile(img, bounds, allow_fallback=False):
+    """
+    Detect wells in one tile and return them in sheet coordinates.
+    Wells cut by an inner tile seam are dropped; as long as the overlap is
+    wider than the well, the neighbouring tile sees it whole.
+    """
+    x0, y0, x1, y1 = bounds
+    h, w = img.shape[:2]
+    tile = np.ascontiguousarray(img[y0:y1, x0:x1])
+    blobs = detect_wells(tile, allow_fallback=allow_fallback)
+
+    kept = []
+    for x, y, r in blobs:
+        if x0 > 0 and x - r <= 0:
+            continue
+        if y0 > 0 and y - r <= 0:
+            continue
+        if x1 < w and x + r >= tile.shape[1] - 1:
+            continue
+        if y1 < h and y + r >= tile.shape[0] - 1:
+            continue
+        kept.append((x + x0, y + y0, r))
+    return kept
+
+def dedupe_blobs(blobs, cell=TILE_OVERLAP):
+    """Drop blobs seen by two tiles (same test as well_detect.merge_blobs, grid-bucketed)"""
+    grid = {}
+    unique = []
+    for x, y, r in sorted(blobs, key=lambda b: -b[2]):
+        gx, gy = x // cell, y // cell
+        neighbours = [b for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+                      for b in grid.get((gx + dx, gy + dy), ())]
+        if any(np.hypot(bx - x, by - y) < 0.6 * max(br, r) for bx, by, br in neighbours):
+            continue
+        grid.setdefault((gx, gy), []).append((x, y, r))
+        unique.append((x, y, r))
+    return unique
+
+def required_overlap(blobs, tile=TILE_SIZE):
+    """
+    Overlap that lets every well up to the largest in `blobs` be seen whole
+    by some tile: a well is only cut in both tiles if it is at least as wide
+    as the overlap. Capped at half a tile.
+    """
+    max_r = max((r for _, _, r in blobs), default=0)
+    return min(tile // 2, 2 * (max_r + SEAM_MARGIN) + 1)
+
+def detect_rows_and_wells_tiled(img, tile=TILE_SIZE, overlap=TILE_OVERLAP, workers=MAX_WORKERS):
+    """
+    Tiled counterpart of well_detect.detect_rows_and_wells for very large
+    (memory-mapped) images. Returns (rows, tile_count).
+
+    Contour blobs have no size limit, so the overlap is checked against the
+    largest well found: wells away from seams are seen whole, and if they
+    are wider than the overlap the sheet is tiled again with a wider one.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        def detect_all(overlap):
+            tiles = list(iter_tiles(img.shape, tile, overlap))
+            per_tile = list(pool.map(lambda b: detect_tile(img, b), tiles))
+            return tiles, dedupe_blobs([b for found in per_tile for b in found], cell=overlap)
+
+        tiles, blobs = detect_all(overlap)
+        needed = required_overlap(blobs, tile)
+        if needed > overlap:
+            print(f"[TILED] Largest well ({2 * max(r for _, _, r in blobs)}px) needs more than the {overlap}px "
+                  f"tile overlap; re-tiling with {needed}px", flush=True)
+            overlap = needed
+            tiles, blobs = detect_all(overlap)
+
+        # Hough fallback if the whole sheet found too few (not per tile, where
+        # empty margins would always trigger it)
+        if len(blobs) < EXPECTED_COLS:
+            per_tile = list(pool.map(lambda b: _hough_tile(img, b), tiles))
+            blobs = merge_blobs(blobs, dedupe_blobs([b for found in per_tile for b in found], cell=overlap))
+
+    blobs = sorted(set(blobs), key=lambda b: (b[1], b[0]))
+    return cluster_rows(blobs), len(tiles)
+
+def _hough_tile(img, bounds):
+    x0, y0, x1, y1 = bounds
+    tile = np.ascontiguousarray(img[y0:y1, x0:x1])
+    return [(x + x0, y + y0, r) for x, y, r in hough_fallback(tile)]
@@ -1,7 +1,6 @@
 import cv2
 import math
 import numpy as np
-from sklearn.cluster import DBSCAN
 
 # ==== CONSTANTS (matching reference notebook) ====
 INNER_SCALE = 0.72      # MUST match reference (was incorrectly changed to 0.65)
@@ -62,10 +61,10 @@ def cluster_rows(blobs):
     """Cluster blobs into horizontal rows using Y coordinate DBSCAN"""
     if len(blobs) == 0:
         return []
-    ys = np.array([b[1] for b in blobs]).reshape(-1,1)
+    ys = np.array([b[1] for b in blobs])
     rs = np.array([b[2] for b in blobs])
     eps = max(6.0, np.median(rs)) * 1.8
-    labels = DBSCAN(eps=eps, min_samples=2).fit(ys).labels_
+    labels = dbscan_1d(ys, eps)
 
     rows = {}
     for lbl, blob in zip(labels, blobs):
@@ -76,31 +75,72 @@ def cluster_rows(blobs):
     return [sorted(v, key=lambda b: b[0])
             for k,v in sorted(rows.items(), key=lambda x: np.mean([b[1] for b in x[1]]))]
 
+def dbscan_1d(values, eps):
+    """
+    DBSCAN(eps, min_samples=2) labels for 1-D data, without importing sklearn.
+    With min_samples=2 every point with a neighbour within eps is a core
+    point, so clusters are runs of sorted values whose gaps are <= eps and
+    points with no such neighbour are noise (-1), exactly as sklearn labels
+    them (cluster numbering aside).
+    """
+    order = np.argsort(values, kind="stable")
+    gaps = np.diff(values[order]) <= eps
+    labels = np.full(len(values), -1)
+    run = np.concatenate([[0], np.cumsum(~gaps)])   # run index of each sorted point
+    linked = np.zeros(len(values), dtype=bool)
+    linked[:-1] |= gaps
+    linked[1:] |= gaps
+    labels[order[linked]] = run[linked]
+    return labels
+
 # ==== MAIN DETECTION FUNCTION ====
 
-def detect_rows_and_wells(img):
-    """Detect well plates: HSV mask -> contours -> blobs -> rows"""
+def merge_blobs(blobs, extra):
+    """Add blobs from `extra` that don't duplicate a blob already in `blobs`"""
+    for hb in extra:
+        hx, hy, hr = hb
+        is_duplicate = False
+        for b in blobs:
+            if np.hypot(b[0]-hx, b[1]-hy) < 0.6*max(b[2], hr):
+                is_duplicate = True
+                break
+        if not is_duplicate:
+            blobs.append(hb)
+    return blobs
+
+def detect_wells(img, allow_fallback=True, hough_params=None, info=None):
+    """
+    Detect well blobs: HSV mask -> contours -> blobs (Hough fallback).
+    `hough_params` overrides hough_fallback's defaults (e.g. a narrowed radius
+    range); if `info` is a dict it is filled with what the detection did.
+    """
     hsv = to_hsv(img)
     mask = mask_from_hsv(hsv, s_thresh=30, v_thresh=30)
     clean = morphological_clean(mask)
 
     contours, _ = cv2.findContours(clean, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     blobs = contours_to_circles(contours)
+    contour_blobs = len(blobs)
+    hough_ran = False
 
     # Hough fallback if we found too few
-    if len(blobs) < EXPECTED_COLS:
-        hough_blobs = hough_fallback(img)
+    if allow_fallback and len(blobs) < EXPECTED_COLS:
         # Only add Hough circles if they don't duplicate existing blobs
-        for hb in hough_blobs:
-            hx, hy, hr = hb
-            is_duplicate = False
-            for b in blobs:
-                if np.hypot(b[0]-hx, b[1]-hy) < 0.6*max(b[2], hr):
-                    is_duplicate = True
-                    break
-            if not is_duplicate:
-                blobs.append(hb)
-    
+        blobs = merge_blobs(blobs, hough_fallback(img, **(hough_params or {})))
+        hough_ran = True
+
+    if info is not None:
+        info.update({
+            "contour_blobs": contour_blobs,
+            "hough_ran": hough_ran,
+            "hough_added": len(blobs) - contour_blobs,
+            "fallback_needed": contour_blobs < EXPECTED_COLS
+        })
+    return blobs
+
+def detect_rows_and_wells(img, allow_fallback=True, hough_params=None, info=None):
+    """Detect well plates: HSV mask -> contours -> blobs -> rows"""
+    blobs = detect_wells(img, allow_fallback, hough_params, info)
     blobs = sorted(set(blobs), key=lambda b:(b[1], b[0]))
     return cluster_rows(blobs)
     if scale_factor > 1.0:
@@ -10,6 +10,9 @@ warnings.filterwarnings('ignore')
 
 app = FastAPI(title="Color Strip Analyzer")
 
+MIN_BLOB_AREA = 60      # Pads smaller than this (px^2, after resizing to 800px) are noise
+MIN_CIRCULARITY = 0.3
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -51,6 +54,28 @@ def rgb_to_hsv_np(r: np.ndarray, g: np.ndarray, b: np.ndarray):
     return h, s, v
 
 
+def find_strip_blobs(mask_clean: np.ndarray) -> List[tuple]:
+    """Pad candidates (x, y, r, area, circularity) among the external contours of a cleaned mask."""
+    cnts, _ = cv2.findContours(mask_clean, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    # Cheapest rejection first: on noisy photos almost every contour is a
+    # speck below MIN_BLOB_AREA, so skip perimeter and enclosing circle for it
+    blobs = []
+    for c in cnts:
+        area = cv2.contourArea(c)
+        if area < MIN_BLOB_AREA:
+            continue
+        peri = cv2.arcLength(c, True)
+        if peri == 0:
+            continue
+        circ = 4.0 * np.pi * area / (peri * peri)
+        if circ < MIN_CIRCULARITY:
+            continue
+        (x, y), r = cv2.minEnclosingCircle(c)
+        blobs.append((int(x), int(y), int(round(r)), float(area), float(circ)))
+    return blobs
+
+
 def analyze_strip_image(img_bgr: np.ndarray) -> Dict[str, Any]:
     """
     Analyze color strip image and extract RGB values for each pad.
@@ -60,7 +85,6 @@ def analyze_strip_image(img_bgr: np.ndarray) -> Dict[str, Any]:
     CONCENTRATIONS = [0.5, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
     SAT_THRESH = 35
     VAL_THRESH = 40
-    MIN_BLOB_AREA = 60
 
     # Resize for consistency
     h0, w0 = img_bgr.shape[:2]
@@ -81,20 +105,7 @@ def analyze_strip_image(img_bgr: np.ndarray) -> Dict[str, Any]:
     mask_clean = cv2.morphologyEx(mask_open, cv2.MORPH_CLOSE, kc, iterations=1)
 
     # Find contours
-    cnts, _ = cv2.findContours(mask_clean.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-    blobs = []
-    for c in cnts:
-        area = cv2.contourArea(c)
-        if area < 5:
-            continue
-        peri = cv2.arcLength(c, True)
-        if peri == 0:
-            continue
-        circ = 4.0 * np.pi * area / (peri * peri)
-        (x, y), r = cv2.minEnclosingCircle(c)
-        if area >= MIN_BLOB_AREA and circ >= 0.3:
-            blobs.append((int(x), int(y), int(round(r)), float(area), float(circ)))
+    blobs = find_strip_blobs(mask_clean)
 
     if not blobs:
         raise ValueError("No valid color pads detected on the strip.")
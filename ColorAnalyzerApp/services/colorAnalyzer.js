@@ -1,4 +1,5 @@
 import axios from "axios";
+import AsyncStorage from "@react-native-async-storage/async-storage";
 import * as ImageManipulator from "expo-image-manipulator";
 
 // Get backend URL from environment
@@ -13,6 +14,37 @@ const API = axios.create({
   timeout: 30000,  // Fail faster when backend is unreachable
 });
 
+// Stable per-install ID sent as X-Device-Id, so the backend keys its
+// per-device detection profile to this phone rather than to the client IP
+// (which phones behind one NAT or tunnel share)
+const DEVICE_ID_KEY = "colorAnalyzer.deviceId";
+let deviceIdPromise = null;
+
+function getDeviceId() {
+  if (!deviceIdPromise) {
+    deviceIdPromise = (async () => {
+      try {
+        let id = await AsyncStorage.getItem(DEVICE_ID_KEY);
+        if (!id) {
+          id = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+          await AsyncStorage.setItem(DEVICE_ID_KEY, id);
+        }
+        return id;
+      } catch (error) {
+        console.error("❌ Could not read device ID:", error);
+        deviceIdPromise = null;  // retry next time; the backend falls back to the client address
+        return null;
+      }
+    })();
+  }
+  return deviceIdPromise;
+}
+
+async function deviceHeaders() {
+  const id = await getDeviceId();
+  return id ? { "X-Device-Id": id } : {};
+}
+
 export async function analyzeImageColors(imageUri) {
   try {
     const manipulated = await ImageManipulator.manipulateAsync(
@@ -31,7 +63,9 @@ export async function analyzeImageColors(imageUri) {
       type: "image/jpeg",
     });
 
-    const response = await API.post("/analyze", formData);
+    const response = await API.post("/analyze", formData, {
+      headers: await deviceHeaders(),
+    });
 
     console.log("✅ Backend response received:", response.data);
     return response.data;
@@ -41,3 +75,58 @@ export async function analyzeImageColors(imageUri) {
     throw error;
   }
 }
+
+// Live preview: open a WebSocket to /stream, send encoded frames (ArrayBuffer
+// of a JPEG) with sendFrame, and receive one reading per processed frame.
+// reading.stability.stable turns true once the concentrations have converged.
+export function openAnalysisStream(onReading, onError) {
+  const wsUrl = BACKEND_URL.replace(/^http/, "ws") + "/stream";
+  const socket = new WebSocket(wsUrl);
+  socket.binaryType = "arraybuffer";
+
+  socket.onmessage = (event) => {
+    try {
+      onReading(JSON.parse(event.data));
+    } catch (error) {
+      console.error("❌ Invalid stream message:", error);
+    }
+  };
+  socket.onerror = (error) => {
+    console.error("❌ Stream connection failed:", error);
+    if (onError) onError(error);
+  };
+
+  return {
+    sendFrame: (frameBuffer) => {
+      if (socket.readyState === WebSocket.OPEN) socket.send(frameBuffer);
+    },
+    close: () => socket.close(),
+  };
+}
+
+// Queued analysis: POST /jobs returns at once with a job id, then the job is
+// polled until it finishes, so slow uploads over a tunnel never hit the
+// request timeout. Resolves with the same data as analyzeImageColors.
+export async function analyzeImageColorsQueued(imageUri, pollIntervalMs = 1000) {
+  const formData = new FormData();
+  formData.append("file", {
+    uri: imageUri,
+    name: "image.jpg",
+    type: "image/jpeg",
+  });
+
+  const { data: job } = await API.post("/jobs", formData, {
+    params: { priority: "interactive" },
+    headers: await deviceHeaders(),
+  });
+  console.log("📤 Job queued:", job.job_id, "position", job.queue_position);
+
+  while (true) {
+    await new Promise((resolve) => setTimeout(resolve, pollIntervalMs));
+    const { data } = await API.get(`/jobs/${job.job_id}`);
+    if (data.status === "done") return data.result;
+    if (data.status === "failed" || data.status === "cancelled") {
+      throw new Error(data.error || `Job ${data.status}`);
+    }
+  }
+}